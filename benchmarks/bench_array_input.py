@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""
+计算工具数组输入基准测试
+比较JSON数字列表和base64编码的float64/float32数组作为calculate_stats输入时的
+请求体大小，以及解析请求体加上调用工具 (参数校验、解码、统计) 的总耗时。
+
+用法:
+    python benchmarks/bench_array_input.py [--sizes 10000,100000,1000000]
+"""
+import argparse
+import asyncio
+import logging
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.streamable_http_server import dispatcher
+from src.serializer import dumps, loads
+from src.array_input import encode_array
+
+
+def request_body(numbers):
+    return dumps({
+        "jsonrpc": "2.0", "method": "call_tool",
+        "params": {"name": "calculate_stats", "parameters": {"numbers": numbers}}, "id": "1"
+    })
+
+
+async def best_of(raw, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = await dispatcher.dispatch(loads(raw))
+        best = min(best, time.perf_counter() - start)
+        assert "isError" not in response["result"], response
+    return best * 1000
+
+
+async def main(sizes, repeat):
+    print(f"{'长度':>10}{'编码':>10}{'请求体(KB)':>14}{'耗时(ms)':>12}")
+    for size in sizes:
+        values = [random.gauss(100.0, 15.0) for _ in range(size)]
+        cases = {
+            "json": values,
+            "float64": encode_array(values, "float64"),
+            "float32": encode_array(values, "float32"),
+        }
+        for name, numbers in cases.items():
+            raw = request_body(numbers)
+            elapsed = await best_of(raw, repeat)
+            print(f"{size:>10}{name:>10}{len(raw) / 1024:>14.1f}{elapsed:>12.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="计算工具数组输入基准测试")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="逗号分隔的数组长度")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="每种情况重复次数 (取最好成绩)")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+    asyncio.run(main([int(size) for size in args.sizes.split(",")], args.repeat))
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+"""
+ASGI快速路径基准测试
+在进程内直接调用ASGI应用 (不经过网络)，比较FastAPI路由和快速路径处理
+POST /mcp 的单请求延迟
+
+用法:
+    python benchmarks/bench_asgi_fast_path.py [-n 请求数]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.streamable_http_server import app, fast_app
+
+
+def make_scope(headers):
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/mcp",
+        "raw_path": b"/mcp",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(k.encode(), v.encode()) for k, v in headers.items()],
+        "client": ("127.0.0.1", 12345),
+        "server": ("127.0.0.1", 3000),
+    }
+
+
+async def call(asgi_app, body, headers):
+    """调用一次ASGI应用，返回 (状态码, 响应头, 响应体)"""
+    payload = json.dumps(body).encode()
+    received = False
+    result = {"status": None, "headers": {}, "body": []}
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+            result["headers"] = {k.decode(): v.decode() for k, v in message["headers"]}
+        elif message["type"] == "http.response.body":
+            result["body"].append(message.get("body", b""))
+
+    await asgi_app(make_scope(headers), receive, send)
+    return result["status"], result["headers"], b"".join(result["body"])
+
+
+async def bench(name, asgi_app, session_id, body, n):
+    headers = {"content-type": "application/json", "accept": "application/json", "mcp-session-id": session_id}
+    for _ in range(200):
+        await call(asgi_app, body, headers)
+
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        status, _, _ = await call(asgi_app, body, headers)
+        samples.append((time.perf_counter() - start) * 1e6)
+        assert status == 200, status
+
+    samples.sort()
+    return {
+        "name": name,
+        "mean": statistics.fmean(samples),
+        "p50": samples[len(samples) // 2],
+        "p99": samples[int(len(samples) * 0.99)],
+    }
+
+
+async def main(n):
+    init = {"jsonrpc": "2.0", "method": "initialize", "params": {}, "id": "1"}
+    _, headers, _ = await call(app, init, {"content-type": "application/json", "accept": "application/json"})
+    session_id = headers["mcp-session-id"]
+
+    cases = {
+        "call_tool": {
+            "jsonrpc": "2.0", "method": "call_tool",
+            "params": {"name": "calculate_sum", "parameters": {"numbers": [1, 2, 3, 4, 5]}}, "id": "2"
+        },
+        "list_tools": {"jsonrpc": "2.0", "method": "list_tools", "id": "3"},
+    }
+
+    print(f"{'请求':<12}{'路径':<10}{'平均(us)':>10}{'p50(us)':>10}{'p99(us)':>10}")
+    for case, body in cases.items():
+        results = [
+            await bench("fastapi", app, session_id, body, n),
+            await bench("asgi", fast_app, session_id, body, n),
+        ]
+        for r in results:
+            print(f"{case:<12}{r['name']:<10}{r['mean']:>10.1f}{r['p50']:>10.1f}{r['p99']:>10.1f}")
+        print(f"{'':<12}{'提升':<10}{results[0]['mean'] / results[1]['mean']:>9.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ASGI快速路径基准测试")
+    parser.add_argument("-n", type=int, default=5000, help="每种情况的请求数")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+    asyncio.run(main(args.n))
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+"""
+计算工具统计引擎基准测试
+比较原来的实现 (sum、sum、min、max四次遍历)、纯Python单次遍历引擎和
+NumPy向量化引擎在不同输入长度下的耗时。新引擎额外计算方差、标准差、
+中位数和p90/p99百分位数。另外比较calculate_sum使用的total()与内置sum，
+列表输入不应比内置sum慢。
+
+用法:
+    python benchmarks/bench_calculator_stats.py [--sizes 1000,10000,100000,1000000]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src import stats_engine
+
+PERCENTILES = (90, 99)
+
+
+def legacy_stats(numbers):
+    """原来的calculate_stats实现"""
+    return {
+        "sum": sum(numbers),
+        "average": sum(numbers) / len(numbers),
+        "min": min(numbers),
+        "max": max(numbers),
+        "count": len(numbers)
+    }
+
+
+def best_of(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main(sizes, repeat):
+    cases = {
+        "legacy": lambda data: legacy_stats(data),
+        "python": lambda data: stats_engine._describe_python(data, PERCENTILES),
+    }
+    if stats_engine.np is not None:
+        np = stats_engine.np
+        cases["numpy(list)"] = lambda data: stats_engine._describe_numpy(np.asarray(data, dtype=np.float64), PERCENTILES)
+        arrays = {}
+        cases["numpy(array)"] = lambda data: stats_engine._describe_numpy(arrays[len(data)], PERCENTILES)
+    else:
+        print("未安装NumPy，只测试纯Python实现")
+
+    print(f"{'长度':>10}" + "".join(f"{name:>14}" for name in cases) + "   (毫秒，越小越好)")
+    for size in sizes:
+        data = [random.gauss(100.0, 15.0) for _ in range(size)]
+        if stats_engine.np is not None:
+            arrays[size] = stats_engine.np.asarray(data)
+        timings = [best_of(lambda: case(data), repeat) for case in cases.values()]
+        print(f"{size:>10}" + "".join(f"{t:>14.3f}" for t in timings))
+
+    sums = {
+        "sum": lambda data: sum(data),
+        "total(list)": lambda data: stats_engine.total(data),
+    }
+    if stats_engine.np is not None:
+        sums["total(array)"] = lambda data: stats_engine.total(arrays[len(data)])
+    print()
+    print(f"{'长度':>10}" + "".join(f"{name:>14}" for name in sums) + "   (求和，毫秒)")
+    for size in sizes:
+        data = [random.gauss(100.0, 15.0) for _ in range(size)]
+        if stats_engine.np is not None:
+            arrays[size] = stats_engine.np.asarray(data)
+        timings = [best_of(lambda: case(data), repeat) for case in sums.values()]
+        print(f"{size:>10}" + "".join(f"{t:>14.3f}" for t in timings))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="计算工具统计引擎基准测试")
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000", help="逗号分隔的输入长度")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="每种情况重复次数 (取最好成绩)")
+    args = parser.parse_args()
+    main([int(size) for size in args.sizes.split(",")], args.repeat)
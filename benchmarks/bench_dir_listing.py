@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+"""
+目录列表基准测试
+在临时目录中创建大量空文件，比较原来的listdir (只有名称，代理需要逐个stat)、
+listdir加逐个stat，以及dir:// 分页列表取第一页和按游标翻完全部页的耗时。
+
+用法:
+    python benchmarks/bench_dir_listing.py [--entries 100000] [--limit 1000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.dir_listing import DirQuery, list_directory, decode_cursor
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def all_pages(path, limit):
+    pages, cursor = 0, None
+    while True:
+        listing = list_directory(path, DirQuery(limit, cursor))
+        pages += 1
+        if "nextCursor" not in listing:
+            return pages
+        cursor = decode_cursor(listing["nextCursor"])
+
+
+def main(entries, limit):
+    with tempfile.TemporaryDirectory() as directory:
+        for index in range(entries):
+            open(os.path.join(directory, f"file-{index:07d}.log"), "w").close()
+        cases = [
+            ("listdir (仅名称)", lambda: len("\n".join(os.listdir(directory)))),
+            ("listdir + 逐个stat", lambda: [os.stat(os.path.join(directory, name)) for name in os.listdir(directory)]),
+            (f"第一页 (limit={limit})", lambda: list_directory(directory, DirQuery(limit))),
+            ("翻完全部页", lambda: all_pages(directory, limit)),
+        ]
+        print(f"{entries}个条目")
+        print(f"{'方式':<22}{'耗时(ms)':>12}")
+        for name, func in cases:
+            elapsed, _ = timed(func)
+            print(f"{name:<22}{elapsed:>12.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="目录列表基准测试")
+    parser.add_argument("--entries", type=int, default=100000, help="目录中的条目数")
+    parser.add_argument("--limit", type=int, default=1000, help="每页条目数")
+    args = parser.parse_args()
+    main(args.entries, args.limit)
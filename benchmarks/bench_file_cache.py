@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+"""
+文件内容缓存基准测试
+通过分发器反复读取仓库中的源代码和文档 (file:// 资源)，比较不使用缓存、
+使用缓存和使用zlib压缩缓存时每次读取的平均耗时，以及缓存占用的内存。
+
+用法:
+    python benchmarks/bench_file_cache.py [--rounds 20]
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from src.streamable_http_server import dispatcher
+from src.resources import filesystem
+from src.file_cache import ContentCache
+
+
+async def read_all(paths):
+    for path in paths:
+        response = await dispatcher.dispatch({
+            "jsonrpc": "2.0", "method": "read_resource", "id": "1", "params": {"uri": f"file://{path}"}
+        })
+        assert not response["result"]["contents"][0]["text"].startswith("Error"), path
+
+
+async def main(rounds):
+    paths = sorted(str(path) for pattern in ("src/**/*.py", "*.md") for path in ROOT.glob(pattern))
+    print(f"{len(paths)}个文件, 共{sum(Path(path).stat().st_size for path in paths) / 1024:.0f}KB")
+    print(f"{'模式':>10}{'每次读取(us)':>16}{'缓存(KB)':>12}")
+    for name, cache in (
+        ("不缓存", ContentCache(budget=0)),
+        ("缓存", ContentCache()),
+        ("zlib缓存", ContentCache(compress=True)),
+    ):
+        filesystem.file_cache = cache
+        await read_all(paths)
+        start = time.perf_counter()
+        for _ in range(rounds):
+            await read_all(paths)
+        elapsed = (time.perf_counter() - start) / rounds / len(paths)
+        print(f"{name:>10}{elapsed * 1e6:>16.1f}{cache.bytes / 1024:>12.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="文件内容缓存基准测试")
+    parser.add_argument("-r", "--rounds", type=int, default=20, help="读取全部文件的轮数")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+    asyncio.run(main(args.rounds))
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+"""
+文件资源读取基准测试
+生成一个日志文件，比较整体读取 (原来的f.read())、字节范围、行范围和
+分块读取整个文件的耗时和Python堆内存峰值 (tracemalloc)。
+
+用法:
+    python benchmarks/bench_file_reads.py [--size-mb 200] [--chunk-kb 64]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.file_reader import read_bytes, read_lines, iter_chunks
+
+LINE = "2026-10-17 12:00:00 INFO 请求处理完成 session=3f2a latency_ms=12.5\n"
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed * 1000, peak / 1024 / 1024, result
+
+
+def whole(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return len(f.read())
+
+
+def main(size_mb, chunk_kb):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "app.log")
+        line_count = size_mb * 1024 * 1024 // len(LINE.encode("utf-8"))
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(LINE * line_count)
+        middle = os.path.getsize(path) // 2
+        cases = [
+            ("整体读取", lambda: whole(path)),
+            ("字节范围64KB", lambda: len(read_bytes(path, middle, 65536))),
+            ("行范围100行", lambda: len(read_lines(path, line_count // 2, line_count // 2 + 99))),
+            ("分块读取全部", lambda: sum(len(text) for _, _, text in iter_chunks(path, chunk_size=chunk_kb * 1024))),
+        ]
+        print(f"文件大小: {os.path.getsize(path) / 1024 / 1024:.0f}MB, {line_count}行")
+        print(f"{'方式':<14}{'耗时(ms)':>12}{'内存峰值(MB)':>16}")
+        for name, func in cases:
+            elapsed, peak, _ = measure(func)
+            print(f"{name:<14}{elapsed:>12.1f}{peak:>16.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="文件资源读取基准测试")
+    parser.add_argument("--size-mb", type=int, default=200, help="生成的日志文件大小 (MB)")
+    parser.add_argument("--chunk-kb", type=int, default=64, help="分块读取的块大小 (KB)")
+    args = parser.parse_args()
+    main(args.size_mb, args.chunk_kb)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""
+工具结果缓存基准测试
+比较calculate_stats在不同输入长度下未命中缓存 (每次调用前清空缓存) 和
+命中缓存时经过分发器的调用耗时。两种情况都包括参数校验，命中时省掉的是
+统计计算，多出的是计算缓存键。
+
+用法:
+    python benchmarks/bench_memoize.py [--sizes 100,1000,10000,100000]
+"""
+import argparse
+import asyncio
+import logging
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.streamable_http_server import dispatcher
+from src import memoize
+
+
+async def best_of(request, repeat, cold):
+    best = float("inf")
+    for _ in range(repeat):
+        if cold:
+            memoize.clear()
+        start = time.perf_counter()
+        response = await dispatcher.dispatch(request)
+        best = min(best, time.perf_counter() - start)
+        assert "isError" not in response["result"], response
+    return best * 1000
+
+
+async def main(sizes, repeat):
+    print(f"{'长度':>10}{'未命中(ms)':>14}{'命中(ms)':>12}{'加速':>8}")
+    for size in sizes:
+        request = {
+            "jsonrpc": "2.0", "method": "call_tool", "id": "1",
+            "params": {"name": "calculate_stats", "parameters": {
+                "numbers": [random.gauss(100.0, 15.0) for _ in range(size)], "percentiles": [90, 99]
+            }}
+        }
+        cold = await best_of(request, repeat, True)
+        warm = await best_of(request, repeat, False)
+        print(f"{size:>10}{cold:>14.3f}{warm:>12.3f}{cold / warm:>7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="工具结果缓存基准测试")
+    parser.add_argument("--sizes", default="100,1000,10000,100000", help="逗号分隔的数组长度")
+    parser.add_argument("-r", "--repeat", type=int, default=20, help="每种情况重复次数 (取最好成绩)")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+    asyncio.run(main([int(size) for size in args.sizes.split(",")], args.repeat))
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+"""
+请求日志基准测试
+在进程内通过ASGI快速路径发送 call_tool 请求，比较不同日志配置下的吞吐量：
+- off: 日志级别为WARNING，请求日志全部跳过
+- sync: 在请求协程中直接格式化并写出 (相当于原来的logging.basicConfig)
+- async: 通过QueueHandler交给后台线程格式化和写出
+- async+sample: 后台线程输出，并且只采样10%的请求
+
+日志默认写入os.devnull，只衡量日志对请求路径的开销；--output可以指定文件，
+--latency可以给每次写出加上阻塞延迟，模拟日志管道背压 (例如日志收集端处理不过来)。
+
+用法:
+    python benchmarks/bench_request_logging.py [-n 请求数] [-r 轮数] [--format text|json] [--output 路径] [--latency 微秒]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from src.streamable_http_server import fast_app, request_log
+from src.request_log import setup_logging, stop_logging
+from bench_asgi_fast_path import call
+
+CONFIGS = {
+    "off": {"level": "WARNING", "use_async": False, "rates": {}},
+    "sync": {"level": "INFO", "use_async": False, "rates": {}},
+    "async": {"level": "INFO", "use_async": True, "rates": {}},
+    "async+sample": {"level": "INFO", "use_async": True, "rates": {"call_tool": 0.1}},
+}
+
+
+class SlowStream:
+    """每次写出阻塞一段时间的输出流"""
+
+    def __init__(self, stream, latency):
+        self.stream = stream
+        self.latency = latency
+
+    def write(self, text):
+        time.sleep(self.latency)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+async def run(session_id, body, n):
+    headers = {"content-type": "application/json", "accept": "application/json", "mcp-session-id": session_id}
+    for _ in range(200):
+        await call(fast_app, body, headers)
+
+    start = time.perf_counter()
+    for _ in range(n):
+        status, _, _ = await call(fast_app, body, headers)
+        assert status == 200, status
+    return n / (time.perf_counter() - start)
+
+
+async def main(n, rounds, fmt, output, latency):
+    sink = open(output, "w")
+    if latency:
+        sink = SlowStream(sink, latency / 1e6)
+    setup_logging(level="WARNING", use_async=False, stream=sink, force=True)
+    init = {"jsonrpc": "2.0", "method": "initialize", "params": {}, "id": "1"}
+    _, headers, _ = await call(fast_app, init, {"content-type": "application/json", "accept": "application/json"})
+    session_id = headers["mcp-session-id"]
+    body = {
+        "jsonrpc": "2.0", "method": "call_tool",
+        "params": {"name": "calculate_sum", "parameters": {"numbers": [1, 2, 3, 4, 5]}}, "id": "2"
+    }
+
+    # 各配置轮流运行多轮，取每个配置的最好成绩，减少运行顺序和噪声的影响
+    best = {name: 0.0 for name in CONFIGS}
+    for _ in range(rounds):
+        for name, config in CONFIGS.items():
+            setup_logging(level=config["level"], fmt=fmt, use_async=config["use_async"], stream=sink, force=True)
+            request_log.sample_rates = config["rates"]
+            best[name] = max(best[name], await run(session_id, body, n))
+            stop_logging()
+
+    print(f"{'配置':<14}{'请求/秒':>12}{'相对off':>10}")
+    for name, throughput in best.items():
+        print(f"{name:<14}{throughput:>12.0f}{throughput / best['off']:>9.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="请求日志基准测试")
+    parser.add_argument("-n", type=int, default=5000, help="每种配置每轮的请求数")
+    parser.add_argument("-r", "--rounds", type=int, default=3, help="轮数")
+    parser.add_argument("--format", choices=("text", "json"), default="text", help="日志格式")
+    parser.add_argument("--output", default=os.devnull, help="日志输出文件")
+    parser.add_argument("--latency", type=float, default=0, help="每次写出的阻塞延迟 (微秒)")
+    args = parser.parse_args()
+    asyncio.run(main(args.n, args.rounds, args.format, args.output, args.latency))
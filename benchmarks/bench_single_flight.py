@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""
+相同工具调用合并基准测试
+注册一个模拟数据库查询的工具 (固定延迟，并发查询数受连接池限制)，
+比较不合并和合并 (@coalesce) 时大量会话同时查询少数几个用户的总耗时
+和实际执行次数。
+
+用法:
+    python benchmarks/bench_single_flight.py [--callers 200] [--keys 5] [--latency 20] [--pool 10]
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.streamable_http_server import dispatcher, mcp
+from src.single_flight import coalesce
+
+executions = 0
+
+
+def register(latency, pool):
+    connections = asyncio.Semaphore(pool)
+
+    async def lookup(user_id: str) -> dict:
+        global executions
+        async with connections:
+            executions += 1
+            await asyncio.sleep(latency)
+            return {"id": user_id, "name": "示例用户"}
+
+    async def bench_lookup(user_id: str) -> dict:
+        return await lookup(user_id)
+
+    @mcp.tool()
+    @coalesce
+    async def bench_lookup_coalesced(user_id: str) -> dict:
+        return await lookup(user_id)
+
+    mcp.tool()(bench_lookup)
+
+
+async def run(tool, callers, keys):
+    global executions
+    executions = 0
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        dispatcher.dispatch({
+            "jsonrpc": "2.0", "method": "call_tool", "id": str(i),
+            "params": {"name": tool, "parameters": {"user_id": f"user-{i % keys}"}}
+        })
+        for i in range(callers)
+    ])
+    return (time.perf_counter() - start) * 1000, executions
+
+
+async def main(callers, keys, latency, pool):
+    register(latency / 1000, pool)
+    print(f"{'模式':>10}{'总耗时(ms)':>14}{'执行次数':>10}")
+    for name, tool in (("独立执行", "bench_lookup"), ("合并", "bench_lookup_coalesced")):
+        elapsed, count = await run(tool, callers, keys)
+        print(f"{name:>10}{elapsed:>14.1f}{count:>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="相同工具调用合并基准测试")
+    parser.add_argument("--callers", type=int, default=200, help="同时发起的调用数")
+    parser.add_argument("--keys", type=int, default=5, help="不同的参数数量")
+    parser.add_argument("--latency", type=float, default=20, help="模拟查询延迟 (毫秒)")
+    parser.add_argument("--pool", type=int, default=10, help="模拟连接池大小")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+    asyncio.run(main(args.callers, args.keys, args.latency, args.pool))
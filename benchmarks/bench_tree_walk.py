@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+目录树遍历基准测试
+在临时目录中创建多层目录树，比较逐个目录请求dir:// (每层一次往返，这里不计
+网络开销)、单线程os.walk加逐个stat，以及tree:// 遍历在不同并发数下的耗时。
+
+用法:
+    python benchmarks/bench_tree_walk.py [--fanout 8] [--depth 4] [--files 10]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.dir_listing import DirQuery, list_directory
+from src.file_io import file_io
+from src.tree_walk import TreeQuery, TreeWalk
+
+
+def build_tree(root, fanout, depth, files):
+    directories = 1
+    for index in range(files):
+        open(os.path.join(root, f"file-{index}.py"), "w").close()
+    if depth > 0:
+        for index in range(fanout):
+            child = os.path.join(root, f"dir-{index}")
+            os.mkdir(child)
+            directories += build_tree(child, fanout, depth - 1, files)
+    return directories
+
+
+async def per_directory(root):
+    """模拟代理逐个目录请求dir://"""
+    count, pending = 0, [root]
+    while pending:
+        path = pending.pop()
+        listing = await file_io.run(list_directory, path, DirQuery(10000))
+        for entry in listing["entries"]:
+            count += 1
+            if entry["type"] == "dir":
+                pending.append(os.path.join(path, entry["name"]))
+    return count
+
+
+def os_walk(root):
+    count = 0
+    for path, directories, names in os.walk(root):
+        for name in directories + names:
+            os.lstat(os.path.join(path, name))
+            count += 1
+    return count
+
+
+async def tree(root, concurrency):
+    manifest = await TreeWalk(root, TreeQuery(), concurrency).collect()
+    return len(manifest["entries"])
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def main(fanout, depth, files):
+    with tempfile.TemporaryDirectory() as root:
+        directories = build_tree(root, fanout, depth, files)
+        cases = [
+            ("逐个目录dir://", lambda: asyncio.run(per_directory(root))),
+            ("os.walk + lstat", lambda: os_walk(root)),
+        ] + [
+            (f"tree:// 并发{concurrency}", lambda concurrency=concurrency: asyncio.run(tree(root, concurrency)))
+            for concurrency in (1, 4, 8, 16)
+        ]
+        print(f"{directories}个目录")
+        print(f"{'方式':<22}{'条目数':>10}{'耗时(ms)':>12}")
+        for name, func in cases:
+            elapsed, count = timed(func)
+            print(f"{name:<22}{count:>10}{elapsed:>12.1f}")
+        file_io.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="目录树遍历基准测试")
+    parser.add_argument("--fanout", type=int, default=8, help="每个目录的子目录数")
+    parser.add_argument("--depth", type=int, default=4, help="目录树的层数")
+    parser.add_argument("--files", type=int, default=10, help="每个目录中的文件数")
+    args = parser.parse_args()
+    main(args.fanout, args.depth, args.files)
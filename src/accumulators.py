@@ -0,0 +1,364 @@
+"""
+增量统计累加器
+代理分批产生数据时，每批数据推入累加器即可得到累计的统计信息，不必每次
+对不断增长的完整列表重新计算。每个累加器占用固定大小的内存：
+- RunningStats: 数量、平均值、离差平方和 (Welford/Chan合并)、最小值、最大值
+- TDigest: 合并式t-digest，最多约compression个质心，用于近似中位数和百分位数
+
+累加器的状态 (上面的固定大小字段和t-digest质心) 作为会话的附加数据保存在
+会话存储中 (见SessionStore.modify_data)，使用共享存储时任意worker都能继续
+推入和查询；会话被删除时一并删除。每批数据的摘要在读写存储之前计算，
+存储中只做固定大小的合并。
+
+配置 (环境变量):
+- MCP_MAX_ACCUMULATORS: 每个会话最多同时打开的累加器数，默认16
+- MCP_TDIGEST_COMPRESSION: t-digest默认压缩参数，默认200
+"""
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import os
+import math
+import uuid
+import logging
+
+from .stats_engine import np, use_numpy, as_array, moments, check_percentiles, percentile_key
+from .session_store import SessionStore
+
+logger = logging.getLogger(__name__)
+
+MAX_ACCUMULATORS = int(os.environ.get("MCP_MAX_ACCUMULATORS", 16))
+TDIGEST_COMPRESSION = int(os.environ.get("MCP_TDIGEST_COMPRESSION", 200))
+
+# 会话附加数据中保存累加器的键，值为 {累加器ID: 状态}
+DATA_KEY = "accumulators"
+
+# 一批数据的摘要：(数量, 平均值, 离差平方和, 最小值, 最大值) 和t-digest质心
+Chunk = Tuple[Tuple[int, float, float, float, float], List[Tuple[float, float]]]
+
+
+class RunningStats:
+    """在线计算数量、总和、平均值、方差、最小值和最大值
+
+    每批数据先计算本批的数量、平均值和离差平方和，再用Chan的并行合并公式
+    合并到累计结果中，数值稳定性与Welford逐个更新相同。
+    """
+    __slots__ = ("count", "mean", "m2", "low", "high")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.low = math.inf
+        self.high = -math.inf
+
+    def push(self, values: Sequence[float]) -> None:
+        if len(values) == 0:
+            return
+        self.merge(*self.summarize(values))
+
+    @staticmethod
+    def summarize(values: Sequence[float]) -> Tuple[int, float, float, float, float]:
+        """一批 (非空) 数据的 (数量, 平均值, 离差平方和, 最小值, 最大值)"""
+        if use_numpy(values):
+            data = as_array(values)
+            count = int(data.size)
+            chunk_mean = float(np.sum(data)) / count
+            deviations = data - chunk_mean
+            chunk_m2 = float(np.dot(deviations, deviations))
+            low, high = float(np.min(data)), float(np.max(data))
+        else:
+            count, chunk_sum, low, high, chunk_m2 = moments(values)
+            chunk_mean = chunk_sum / count
+        return count, chunk_mean, chunk_m2, low, high
+
+    def merge(self, count: int, mean: float, m2: float, low: float, high: float) -> None:
+        """合并另一组数据的 (数量, 平均值, 离差平方和, 最小值, 最大值)"""
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.low = min(self.low, low)
+        self.high = max(self.high, high)
+
+    @property
+    def variance(self) -> float:
+        """总体方差"""
+        return self.m2 / self.count if self.count else 0.0
+
+
+class TDigest:
+    """合并式t-digest (k1尺度函数)
+
+    质心按平均值排序保存，靠近两端的质心更小，因此尾部百分位数更精确。
+    每次推入一批数据时把新数据和已有质心一起排序合并，质心数量不超过
+    约compression个，与已推入的数据量无关。
+    """
+    __slots__ = ("compression", "means", "weights", "total", "low", "high")
+
+    def __init__(self, compression: int = TDIGEST_COMPRESSION):
+        self.compression = compression
+        self.means: List[float] = []
+        self.weights: List[float] = []
+        self.total = 0.0
+        self.low = math.inf
+        self.high = -math.inf
+
+    def _k(self, q: float) -> float:
+        return self.compression / (2 * math.pi) * math.asin(2 * min(max(q, 0.0), 1.0) - 1)
+
+    def _q(self, k: float) -> float:
+        return (math.sin(min(max(k * 2 * math.pi / self.compression, -math.pi / 2), math.pi / 2)) + 1) / 2
+
+    def push(self, values: Sequence[float]) -> None:
+        if len(values) == 0:
+            return
+        self.add(self.prepare(values))
+
+    def prepare(self, values: Sequence[float]) -> List[Tuple[float, float]]:
+        """把一批 (非空) 数据排序为按平均值排列的质心，不修改t-digest"""
+        if use_numpy(values):
+            return self._presort_numpy(as_array(values))
+        return [(float(x), 1.0) for x in sorted(values)]
+
+    def add(self, centroids: List[Tuple[float, float]]) -> None:
+        """合并prepare()得到的质心"""
+        self.low = min(self.low, centroids[0][0])
+        self.high = max(self.high, centroids[-1][0])
+        self._merge(centroids)
+
+    def _presort_numpy(self, data: Any) -> List[Tuple[float, float]]:
+        """把一批数据排序后按k值分组为质心，后续合并只需处理少量质心"""
+        data = np.sort(data)
+        n = data.size
+        q = (np.arange(n) + 0.5) / n
+        k = np.floor(self.compression / (2 * math.pi) * np.arcsin(2 * q - 1))
+        starts = np.flatnonzero(np.concatenate(([True], k[1:] != k[:-1])))
+        sums = np.add.reduceat(data, starts)
+        counts = np.diff(np.append(starts, n))
+        return [(float(s / c), float(c)) for s, c in zip(sums, counts)]
+
+    def _merge(self, incoming: List[Tuple[float, float]]) -> None:
+        items = sorted(list(zip(self.means, self.weights)) + incoming)
+        total = self.total + sum(weight for _, weight in incoming)
+
+        means: List[float] = []
+        weights: List[float] = []
+        cur_mean, cur_weight = items[0]
+        so_far = 0.0
+        limit = total * self._q(self._k(0.0) + 1)
+        for mean, weight in items[1:]:
+            if so_far + cur_weight + weight <= limit:
+                cur_weight += weight
+                cur_mean += (mean - cur_mean) * weight / cur_weight
+            else:
+                so_far += cur_weight
+                means.append(cur_mean)
+                weights.append(cur_weight)
+                limit = total * self._q(self._k(so_far / total) + 1)
+                cur_mean, cur_weight = mean, weight
+        means.append(cur_mean)
+        weights.append(cur_weight)
+
+        self.means, self.weights, self.total = means, weights, total
+
+    def quantile(self, q: float) -> float:
+        """近似分位数 (q在0到1之间)，质心之间线性插值"""
+        if not self.means:
+            raise ValueError("Accumulator is empty")
+        if q <= 0.0:
+            return self.low
+        if q >= 1.0:
+            return self.high
+        target = q * self.total
+        # 每个质心的权重集中在其中心位置，两端分别与最小值、最大值插值
+        prev_center, prev_mean = 0.0, self.low
+        cumulative = 0.0
+        for mean, weight in zip(self.means, self.weights):
+            center = cumulative + weight / 2
+            if target < center:
+                if center == prev_center:
+                    return mean
+                return prev_mean + (mean - prev_mean) * (target - prev_center) / (center - prev_center)
+            prev_center, prev_mean = center, mean
+            cumulative += weight
+        if self.total == prev_center:
+            return self.high
+        return prev_mean + (self.high - prev_mean) * (target - prev_center) / (self.total - prev_center)
+
+
+class Accumulator:
+    """一个增量统计累加器"""
+    __slots__ = ("stats", "digest", "chunks")
+
+    def __init__(self, compression: int = TDIGEST_COMPRESSION):
+        self.stats = RunningStats()
+        self.digest = TDigest(compression)
+        self.chunks = 0
+
+    def push(self, values: Sequence[float]) -> None:
+        self.add(self.prepare(values))
+
+    def prepare(self, values: Sequence[float]) -> Optional[Chunk]:
+        """计算一批数据的摘要，空的一批返回None"""
+        if len(values) == 0:
+            return None
+        return RunningStats.summarize(values), self.digest.prepare(values)
+
+    def add(self, chunk: Optional[Chunk]) -> None:
+        """合并prepare()得到的摘要，结果与直接push相同"""
+        if chunk is not None:
+            summary, centroids = chunk
+            self.stats.merge(*summary)
+            self.digest.add(centroids)
+        self.chunks += 1
+
+    def to_state(self) -> Dict[str, Any]:
+        """可JSON序列化的固定大小状态"""
+        stats, digest = self.stats, self.digest
+        return {
+            "compression": digest.compression,
+            "count": stats.count,
+            "mean": stats.mean,
+            "m2": stats.m2,
+            "low": stats.low,
+            "high": stats.high,
+            "means": digest.means,
+            "weights": digest.weights,
+            "total": digest.total,
+            "digest_low": digest.low,
+            "digest_high": digest.high,
+            "chunks": self.chunks
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "Accumulator":
+        """根据to_state()的结果恢复累加器"""
+        accumulator = cls(state["compression"])
+        stats, digest = accumulator.stats, accumulator.digest
+        stats.count, stats.mean, stats.m2 = state["count"], state["mean"], state["m2"]
+        stats.low, stats.high = state["low"], state["high"]
+        digest.means, digest.weights = list(state["means"]), list(state["weights"])
+        digest.total = state["total"]
+        digest.low, digest.high = state["digest_low"], state["digest_high"]
+        accumulator.chunks = state["chunks"]
+        return accumulator
+
+    def describe(self, percentiles: Iterable[float] = ()) -> Dict[str, Any]:
+        """与calculate_stats相同的结果格式，中位数和百分位数是近似值"""
+        percentiles = check_percentiles(percentiles)
+        stats = self.stats
+        if stats.count == 0:
+            return {"count": 0, "chunks": self.chunks}
+        result = {
+            "sum": stats.mean * stats.count,
+            "average": stats.mean,
+            "min": stats.low,
+            "max": stats.high,
+            "count": stats.count,
+            "variance": stats.variance,
+            "stddev": math.sqrt(stats.variance),
+            "median": self.digest.quantile(0.5),
+            "chunks": self.chunks,
+            "centroids": len(self.digest.means)
+        }
+        if percentiles:
+            result["percentiles"] = {percentile_key(p): self.digest.quantile(p / 100.0) for p in percentiles}
+        return result
+
+
+class AccumulatorStore:
+    """按会话保存在会话存储中的累加器
+
+    每个操作都是对会话附加数据的一次原子读-改-写 (SQLite存储中是一个
+    BEGIN IMMEDIATE事务)，多个worker同时推入同一个累加器时不会丢失数据。
+    """
+
+    def __init__(self, max_per_session: int = MAX_ACCUMULATORS, store: Optional[SessionStore] = None):
+        self.max_per_session = max_per_session
+        self.store = store
+        self.opened = 0
+        self.closed = 0
+        self.pushes = 0
+
+    def bind(self, store: SessionStore) -> None:
+        """使用会话管理器的存储 (服务器启动时调用)"""
+        self.store = store
+
+    async def _modify(self, session_id: str, func: Any) -> Any:
+        store = self.store
+        if store is None:
+            raise RuntimeError("Accumulator store is not bound to a session store")
+        return await store.run(store.modify_data, session_id, DATA_KEY, func)
+
+    async def open(self, session_id: str, compression: int = TDIGEST_COMPRESSION) -> str:
+        if not 10 <= compression <= 1000:
+            raise ValueError("Compression must be between 10 and 1000")
+        accumulator_id = uuid.uuid4().hex[:12]
+        state = Accumulator(compression).to_state()
+
+        def update(accumulators: Optional[Dict[str, Any]]) -> Tuple[Dict[str, Any], None]:
+            accumulators = accumulators or {}
+            if len(accumulators) >= self.max_per_session:
+                raise ValueError(f"Too many open accumulators in this session (max {self.max_per_session})")
+            accumulators[accumulator_id] = state
+            return accumulators, None
+
+        await self._modify(session_id, update)
+        self.opened += 1
+        return accumulator_id
+
+    async def push(self, session_id: str, accumulator_id: str, values: Sequence[float]) -> Accumulator:
+        """推入一批数据，返回更新后的累加器"""
+        accumulators = await self._load(session_id)
+        compression = _state(accumulators, accumulator_id)["compression"]
+        # 摘要在存储之外计算，事务中只合并固定大小的状态
+        chunk = Accumulator(compression).prepare(values)
+
+        def update(accumulators: Optional[Dict[str, Any]]) -> Tuple[Dict[str, Any], Accumulator]:
+            accumulator = Accumulator.from_state(_state(accumulators, accumulator_id))
+            accumulator.add(chunk)
+            accumulators[accumulator_id] = accumulator.to_state()
+            return accumulators, accumulator
+
+        accumulator = await self._modify(session_id, update)
+        self.pushes += 1
+        return accumulator
+
+    async def get(self, session_id: str, accumulator_id: str) -> Accumulator:
+        return Accumulator.from_state(_state(await self._load(session_id), accumulator_id))
+
+    async def close(self, session_id: str, accumulator_id: str) -> Accumulator:
+        def update(accumulators: Optional[Dict[str, Any]]) -> Tuple[Optional[Dict[str, Any]], Accumulator]:
+            accumulator = Accumulator.from_state(_state(accumulators, accumulator_id))
+            del accumulators[accumulator_id]
+            return accumulators or None, accumulator
+
+        accumulator = await self._modify(session_id, update)
+        self.closed += 1
+        return accumulator
+
+    async def _load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        store = self.store
+        if store is None:
+            raise RuntimeError("Accumulator store is not bound to a session store")
+        return await store.run(store.load_data, session_id, DATA_KEY)
+
+    def stats(self) -> Dict[str, Any]:
+        """本进程的累加器操作计数 (状态保存在会话存储中)"""
+        return {
+            "opened": self.opened,
+            "closed": self.closed,
+            "pushes": self.pushes,
+            "store": type(self.store).__name__ if self.store is not None else None
+        }
+
+
+def _state(accumulators: Optional[Dict[str, Any]], accumulator_id: str) -> Dict[str, Any]:
+    state = (accumulators or {}).get(accumulator_id)
+    if state is None:
+        raise ValueError(f"Unknown accumulator: {accumulator_id}")
+    return state
+
+
+# 全局累加器存储，服务器启动时绑定到会话管理器的存储
+accumulators = AccumulatorStore()
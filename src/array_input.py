@@ -0,0 +1,81 @@
+"""
+紧凑的数值数组输入
+计算工具的numbers参数除了JSON数字列表，还可以是base64编码的小端float32/float64
+缓冲区：{"dtype": "float64", "data": "<base64>"}。解码后直接在字节缓冲区上
+建立NumPy视图或memoryview，不再为每个数创建Python float对象；
+传输大小和解析时间都远小于同样长度的JSON列表。
+"""
+from typing import Any, List, Literal, Sequence, Union
+import sys
+import array
+import base64
+import binascii
+
+from pydantic import BaseModel, Field
+
+from .stats_engine import np, BACKEND
+
+# dtype -> (NumPy类型, array/memoryview类型码, 每个元素的字节数)
+DTYPES = {
+    "float32": ("<f4", "f", 4),
+    "float64": ("<f8", "d", 8),
+}
+
+
+class EncodedArray(BaseModel):
+    """base64编码的小端浮点数组"""
+    dtype: Literal["float32", "float64"] = Field("float64", description="元素类型，小端字节序")
+    data: str = Field(..., description="数组原始字节的base64编码")
+
+
+# 计算工具numbers参数的类型
+Numbers = Union[List[float], EncodedArray]
+
+
+def decode_array(encoded: EncodedArray) -> Sequence[float]:
+    """解码为数值序列：使用NumPy引擎时返回NumPy数组视图，否则返回memoryview"""
+    numpy_type, typecode, itemsize = DTYPES[encoded.dtype]
+    try:
+        raw = base64.b64decode(encoded.data, validate=True)
+    except binascii.Error as e:
+        raise ValueError(f"Invalid base64 array data: {str(e)}")
+    if len(raw) % itemsize:
+        raise ValueError(f"Array data length {len(raw)} is not a multiple of {itemsize} bytes ({encoded.dtype})")
+
+    if BACKEND == "numpy":
+        # 直接在解码后的字节上建立只读视图，不复制
+        return np.frombuffer(raw, dtype=numpy_type)
+    if sys.byteorder == "little":
+        return memoryview(raw).cast(typecode)
+    # 大端机器上需要交换字节序，只能复制一次
+    values = array.array(typecode, raw)
+    values.byteswap()
+    return values
+
+
+def numbers_size(numbers: Any) -> int:
+    """numbers参数中的元素数量 (编码数组按base64长度估算，不解码)
+
+    也接受未经校验的原始JSON值 (编码数组为字典)，供分发器在调用工具前判断。
+    """
+    if isinstance(numbers, EncodedArray):
+        return len(numbers.data) * 3 // 4 // DTYPES[numbers.dtype][2]
+    if isinstance(numbers, dict):
+        return len(numbers["data"]) * 3 // 4 // DTYPES[numbers.get("dtype", "float64")][2]
+    return len(numbers)
+
+
+def decode_numbers(numbers: Any) -> Sequence[float]:
+    """计算工具的numbers参数：列表原样返回，编码数组解码为视图"""
+    if isinstance(numbers, EncodedArray):
+        return decode_array(numbers)
+    return numbers
+
+
+def encode_array(values: Sequence[float], dtype: str = "float64") -> dict:
+    """将数值编码为EncodedArray格式的字典 (供客户端和测试使用)"""
+    _, typecode, _ = DTYPES[dtype]
+    buffer = array.array(typecode, values)
+    if sys.byteorder != "little":
+        buffer.byteswap()
+    return {"dtype": dtype, "data": base64.b64encode(buffer.tobytes()).decode("ascii")}
@@ -0,0 +1,69 @@
+"""
+POST /mcp 的ASGI快速路径
+直接从ASGI receive读取请求体字节，只提取需要的请求头，然后交给共享的
+MCP处理函数，跳过FastAPI的路由匹配、依赖解析和Request对象构建。
+其他请求 (/、/health、GET /mcp等) 仍由FastAPI应用处理。
+"""
+from typing import Dict, Callable, Awaitable, Mapping, Any
+import logging
+
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response
+
+logger = logging.getLogger(__name__)
+
+# 快速路径需要的请求头 (ASGI请求头名称均为小写字节串)
+WANTED_HEADERS = frozenset({
+    b"mcp-session-id",
+    b"accept",
+    b"content-type",
+    b"user-agent",
+    b"if-none-match",
+    b"x-mcp-trace",
+})
+
+Handler = Callable[[bytes, Mapping[str, str]], Awaitable[Response]]
+
+
+async def read_body(receive: Callable[[], Awaitable[Dict[str, Any]]]) -> bytes:
+    """从ASGI receive中读取完整的请求体"""
+    message = await receive()
+    body = message.get("body", b"")
+    if not message.get("more_body", False):
+        return body
+
+    chunks = [body]
+    while message.get("more_body", False):
+        message = await receive()
+        chunks.append(message.get("body", b""))
+    return b"".join(chunks)
+
+
+class MCPFastPath:
+    """拦截 POST /mcp 的ASGI应用，其余请求转发给内部应用
+
+    快速路径自己包一层CORS中间件，与FastAPI应用的CORS配置保持一致。
+    """
+
+    def __init__(self, app: Callable, handler: Handler, path: str = "/mcp", **cors_options: Any):
+        self.app = app
+        self.handler = handler
+        self.path = path
+        self.endpoint = CORSMiddleware(self.handle, **cors_options) if cors_options else self.handle
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] == "http" and scope["method"] == "POST" and scope["path"] == self.path:
+            await self.endpoint(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+    async def handle(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        """读取请求体，调用处理函数并发送响应"""
+        headers = {
+            name.decode("latin-1"): value.decode("latin-1")
+            for name, value in scope["headers"]
+            if name in WANTED_HEADERS
+        }
+        body = await read_body(receive)
+        response = await self.handler(body, headers)
+        await response(scope, receive, send)
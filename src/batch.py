@@ -0,0 +1,74 @@
+"""
+JSON-RPC批量请求处理
+批量中的各个请求在并发上限内同时执行，按完成顺序或请求顺序返回结果
+"""
+from typing import Dict, Any, List, Callable, Awaitable, AsyncIterator, Tuple, Optional
+import os
+import asyncio
+import logging
+
+from .dispatcher import make_error, INVALID_REQUEST, INTERNAL_ERROR
+
+logger = logging.getLogger(__name__)
+
+# 单个批量请求内同时执行的最大请求数，可通过环境变量配置
+BATCH_CONCURRENCY = int(os.environ.get("MCP_BATCH_CONCURRENCY", 8))
+
+Handler = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+def is_notification(message: Any) -> bool:
+    """没有id字段的请求是通知，不需要响应"""
+    return isinstance(message, dict) and "id" not in message
+
+
+async def iter_batch(
+    messages: List[Any],
+    handle: Handler,
+    concurrency: Optional[int] = None
+) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    """并发执行批量请求，按完成顺序产出 (请求序号, 响应)
+
+    通知会被执行，但不产出响应。迭代器提前关闭时 (例如客户端断开)
+    会取消尚未完成的请求。
+    """
+    semaphore = asyncio.Semaphore(concurrency or BATCH_CONCURRENCY)
+
+    async def run(index: int, message: Any) -> Tuple[int, Optional[Dict[str, Any]]]:
+        if not isinstance(message, dict) or "method" not in message:
+            return index, make_error(INVALID_REQUEST, "无效请求", None)
+        async with semaphore:
+            try:
+                response = await handle(message)
+            except Exception as e:
+                logger.error(f"执行批量请求 #{index} 时出错: {str(e)}", exc_info=True)
+                response = make_error(INTERNAL_ERROR, f"服务器内部错误: {str(e)}", message.get("id"))
+        if is_notification(message):
+            return index, None
+        return index, response
+
+    tasks = [asyncio.ensure_future(run(index, message)) for index, message in enumerate(messages)]
+    try:
+        for future in asyncio.as_completed(tasks):
+            index, response = await future
+            if response is not None:
+                yield index, response
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+async def execute_batch(
+    messages: List[Any],
+    handle: Handler,
+    concurrency: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """并发执行批量请求，按请求顺序返回响应数组 (不包含通知)"""
+    if not messages:
+        return [make_error(INVALID_REQUEST, "无效请求: 批量请求为空", None)]
+
+    responses: Dict[int, Dict[str, Any]] = {}
+    async for index, response in iter_batch(messages, handle, concurrency):
+        responses[index] = response
+    return [responses[index] for index in sorted(responses)]
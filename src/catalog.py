@@ -0,0 +1,169 @@
+"""
+工具、资源和提示模板目录缓存
+目录列表根据mcp注册表构建一次并预先序列化为字节，注册表变化时失效，
+每个列表附带ETag以支持条件请求
+"""
+from typing import Dict, Any, Callable, List, Optional, Tuple
+import hashlib
+import logging
+
+from mcp.server.fastmcp import FastMCP
+
+from .serializer import dumps
+
+logger = logging.getLogger(__name__)
+
+# JSON-RPC方法名 -> 目录类别
+LIST_METHODS = {
+    "list_tools": "tools",
+    "list_resources": "resources",
+    "list_prompts": "prompts",
+}
+
+# 注册表管理器上会改变目录内容的方法
+_REGISTRY_HOOKS = {
+    "_tool_manager": ("add_tool", "remove_tool"),
+    "_resource_manager": ("add_resource", "add_template"),
+    "_prompt_manager": ("add_prompt",),
+}
+
+
+def summarize(description: Optional[str]) -> str:
+    """取文档字符串的第一行作为简短描述"""
+    if not description:
+        return ""
+    return description.strip().splitlines()[0].strip()
+
+
+def watch_registry(server: FastMCP, callback: Callable[[], None]) -> None:
+    """在工具、资源或提示模板注册 (或移除) 后调用callback"""
+    for manager_name, method_names in _REGISTRY_HOOKS.items():
+        manager = getattr(server, manager_name)
+        for method_name in method_names:
+            original = getattr(manager, method_name, None)
+            if original is None:
+                continue
+
+            def hooked(*args, __original=original, **kwargs):
+                result = __original(*args, **kwargs)
+                callback()
+                return result
+
+            setattr(manager, method_name, hooked)
+
+
+class Catalog:
+    """目录缓存
+
+    每个类别缓存三份内容：
+    - listings: 结果字典，供批量请求等需要对象的路径使用
+    - payloads: 预先序列化的结果字节
+    - etags: 结果字节的哈希
+    """
+
+    def __init__(self, server: FastMCP):
+        self.server = server
+        self.version = 0
+        self.listings: Dict[str, Dict[str, Any]] = {}
+        self.payloads: Dict[str, bytes] = {}
+        self.etags: Dict[str, str] = {}
+        self._stale = True
+        watch_registry(server, self.invalidate)
+
+    def invalidate(self) -> None:
+        """注册表发生变化，下次访问时重新构建"""
+        self._stale = True
+
+    def refresh(self) -> None:
+        """如果注册表发生过变化，重新构建并序列化目录"""
+        if not self._stale:
+            return
+        self._stale = False
+        self.version += 1
+        self.listings = self.build()
+        self.payloads = {kind: dumps(listing) for kind, listing in self.listings.items()}
+        self.etags = {
+            kind: f'"{hashlib.sha1(payload).hexdigest()}"' for kind, payload in self.payloads.items()
+        }
+        logger.info(f"目录缓存已重建: 版本={self.version}")
+
+    def build(self) -> Dict[str, Dict[str, Any]]:
+        """根据当前注册表构建目录列表"""
+        tools = self.server._tool_manager.list_tools()
+        resources = self.server._resource_manager.list_resources()
+        templates = self.server._resource_manager.list_templates()
+        prompts = self.server._prompt_manager.list_prompts()
+
+        return {
+            "tools": {
+                "tools": [
+                    {
+                        "name": tool.name,
+                        "description": summarize(tool.description),
+                        "inputSchema": tool.parameters
+                    }
+                    for tool in tools
+                ]
+            },
+            "resources": {
+                "resources": [
+                    {
+                        "name": str(resource.uri),
+                        "description": summarize(resource.description),
+                        "mimeType": resource.mime_type
+                    }
+                    for resource in resources
+                ] + [
+                    {
+                        "name": template.uri_template.split("://", 1)[0],
+                        "uriTemplate": template.uri_template,
+                        "description": summarize(template.description),
+                        "mimeType": template.mime_type
+                    }
+                    for template in templates
+                ]
+            },
+            "prompts": {
+                "prompts": [
+                    {
+                        "name": prompt.name,
+                        "description": summarize(prompt.description),
+                        "arguments": [
+                            {"name": arg.name, "required": bool(arg.required)}
+                            for arg in (prompt.arguments or [])
+                        ]
+                    }
+                    for prompt in prompts
+                ]
+            }
+        }
+
+    def listing(self, kind: str) -> Dict[str, Any]:
+        """获取某个类别的结果字典"""
+        self.refresh()
+        return self.listings[kind]
+
+    def payload(self, kind: str) -> Tuple[bytes, str]:
+        """获取某个类别预先序列化的结果字节和ETag"""
+        self.refresh()
+        return self.payloads[kind], self.etags[kind]
+
+    def response_bytes(self, kind: str, request_id: Any) -> Tuple[bytes, str]:
+        """拼接完整的JSON-RPC响应字节，结果部分不再重新序列化"""
+        payload, etag = self.payload(kind)
+        return b'{"jsonrpc":"2.0","result":' + payload + b',"id":' + dumps(request_id) + b'}', etag
+
+
+def list_kind(body: Any) -> Optional[str]:
+    """如果请求是单个目录列表请求，返回对应的目录类别"""
+    if isinstance(body, dict) and isinstance(body.get("method"), str):
+        return LIST_METHODS.get(body["method"])
+    return None
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """检查If-None-Match请求头是否与当前ETag匹配"""
+    if not if_none_match:
+        return False
+    candidates: List[str] = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
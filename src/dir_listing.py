@@ -0,0 +1,117 @@
+"""
+分页的目录列表
+dir:// 资源返回JSON格式的目录列表，每个条目包含名称、类型、大小和修改时间，
+按名称排序并分页：
+
+    dir:///var/log?limit=100&glob=*.log
+    dir:///var/log?limit=100&glob=*.log&cursor=<上一页返回的nextCursor>
+
+每一页通过一次os.scandir遍历得到：遍历时只比较名称，用大小为limit+1的堆
+保留游标之后最小的名称，不会把整个目录读入列表，十万级条目的目录每页的
+内存占用也只与limit有关；只有本页的条目才会调用stat。游标是本页最后一个
+名称的编码，目录在翻页之间增删条目时，其余条目不会重复或遗漏。
+
+配置 (环境变量):
+- MCP_DIR_PAGE_SIZE: 默认每页条目数，默认1000
+- MCP_DIR_MAX_PAGE_SIZE: limit参数的上限，默认10000
+"""
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs
+from fnmatch import translate
+import os
+import re
+import heapq
+import base64
+import binascii
+
+PAGE_SIZE = int(os.environ.get("MCP_DIR_PAGE_SIZE", 1000))
+MAX_PAGE_SIZE = int(os.environ.get("MCP_DIR_MAX_PAGE_SIZE", 10000))
+
+
+class DirQuery:
+    """dir:// URI查询参数"""
+    __slots__ = ("limit", "cursor", "glob")
+
+    def __init__(self, limit: int = PAGE_SIZE, cursor: Optional[str] = None, glob: Optional[str] = None):
+        self.limit = limit
+        self.cursor = cursor
+        self.glob = glob
+
+    @classmethod
+    def parse(cls, query: str) -> "DirQuery":
+        params = {key: values[-1] for key, values in parse_qs(query).items()}
+        unknown = set(params) - {"limit", "cursor", "glob"}
+        if unknown:
+            raise ValueError(f"Unknown directory listing parameters: {', '.join(sorted(unknown))}")
+        try:
+            limit = int(params.get("limit", PAGE_SIZE))
+        except ValueError:
+            raise ValueError("limit must be an integer")
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+        cursor = decode_cursor(params["cursor"]) if params.get("cursor") else None
+        return cls(limit, cursor, params.get("glob") or None)
+
+
+def split_query(path: str) -> Tuple[str, DirQuery]:
+    """把资源路径拆分为目录路径和查询参数"""
+    path, _, query = path.partition("?")
+    return path, DirQuery.parse(query) if query else DirQuery()
+
+
+def encode_cursor(name: str) -> str:
+    return base64.urlsafe_b64encode(os.fsencode(name)).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        return os.fsdecode(base64.b64decode(cursor + "=" * (-len(cursor) % 4), altchars=b"-_", validate=True))
+    except (binascii.Error, ValueError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def entry_type(entry: os.DirEntry) -> str:
+    if entry.is_symlink():
+        return "symlink"
+    if entry.is_dir(follow_symlinks=False):
+        return "dir"
+    if entry.is_file(follow_symlinks=False):
+        return "file"
+    return "other"
+
+
+def describe_entry(entry: os.DirEntry) -> Dict[str, Any]:
+    """条目的名称、类型、大小和修改时间 (符号链接本身的信息，不跟随)"""
+    info: Dict[str, Any] = {"name": entry.name, "type": entry_type(entry)}
+    try:
+        stat = entry.stat(follow_symlinks=False)
+        info["size"] = stat.st_size
+        info["mtime"] = stat.st_mtime
+    except OSError:
+        # 遍历之后条目被删除
+        info["size"] = None
+        info["mtime"] = None
+    return info
+
+
+def list_directory(path: str, query: DirQuery) -> Dict[str, Any]:
+    """按名称排序返回目录的一页条目"""
+    cursor = query.cursor
+    match = re.compile(translate(query.glob)).match if query.glob else None
+    with os.scandir(path) as entries:
+        candidates = (
+            entry for entry in entries
+            if (cursor is None or entry.name > cursor)
+            and (match is None or match(entry.name))
+        )
+        # 多取一个条目，用于判断是否还有下一页
+        page = heapq.nsmallest(query.limit + 1, candidates, key=lambda entry: entry.name)
+    more = len(page) > query.limit
+    page = page[:query.limit]
+    result: Dict[str, Any] = {
+        "path": path,
+        "entries": [describe_entry(entry) for entry in page]
+    }
+    if more:
+        result["nextCursor"] = encode_cursor(page[-1].name)
+    return result
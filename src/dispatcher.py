@@ -0,0 +1,261 @@
+"""
+MCP请求分发器
+启动时根据mcp实例中注册的工具、资源和提示模板构建分发表，
+请求路径上按方法名和工具名做字典查找，不再逐个分支判断
+"""
+from typing import Dict, Any, Callable, Awaitable, Optional
+import time
+import base64
+import logging
+
+from mcp.server.fastmcp import FastMCP
+
+from .catalog import Catalog, watch_registry
+from .serializer import dumps, canonical_dumps
+from . import metrics, tracing
+from .request_context import session_id_var
+from .single_flight import SingleFlight, is_coalesced, should_coalesce
+
+logger = logging.getLogger(__name__)
+
+# JSON-RPC错误码
+INVALID_REQUEST = -32600
+INVALID_PARAMS = -32602
+METHOD_NOT_FOUND = -32601
+INTERNAL_ERROR = -32603
+
+Handler = Callable[[Dict[str, Any], Any], Awaitable[Dict[str, Any]]]
+
+
+def make_result(result: Any, request_id: Any) -> Dict[str, Any]:
+    """构造JSON-RPC成功响应"""
+    return {"jsonrpc": "2.0", "result": result, "id": request_id}
+
+
+def make_error(code: int, message: str, request_id: Any) -> Dict[str, Any]:
+    """构造JSON-RPC错误响应"""
+    return {
+        "jsonrpc": "2.0",
+        "error": {
+            "code": code,
+            "message": message
+        },
+        "id": request_id
+    }
+
+
+def to_text(value: Any) -> str:
+    """将工具返回值转换为文本内容"""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list, bool)) or value is None:
+        return dumps(value).decode("utf-8")
+    return str(value)
+
+
+class Dispatcher:
+    """基于注册表的MCP方法分发器
+
+    所有处理函数在构建时预先绑定到字典中：
+    - methods: JSON-RPC方法名 -> 处理协程
+    - tools: 工具名 -> Tool.run
+    - prompts: 提示模板名 -> Prompt.render
+    - resources: 静态资源URI -> Resource
+    - templates: URI scheme -> ResourceTemplate
+    - coalesced: 标记了@coalesce的工具名 -> 工具函数 (带合并条件)，相同的并发调用只执行一次
+
+    注册新的工具、资源或提示模板后，分发表会在下一次请求前自动重建。
+    """
+
+    def __init__(self, server: FastMCP):
+        self.server = server
+        self.methods: Dict[str, Handler] = {}
+        self.tools: Dict[str, Callable[..., Awaitable[Any]]] = {}
+        self.prompts: Dict[str, Callable[..., Awaitable[Any]]] = {}
+        self.resources: Dict[str, Any] = {}
+        self.templates: Dict[str, Any] = {}
+        self.coalesced: Dict[str, Callable[..., Any]] = {}
+        self.flights = SingleFlight()
+        self.catalog = Catalog(server)
+        self._stale = False
+        self.rebuild()
+        watch_registry(server, self.invalidate)
+
+    def invalidate(self) -> None:
+        """注册表发生变化，下次分发前重新构建分发表"""
+        self._stale = True
+
+    def rebuild(self) -> None:
+        """根据当前注册表重新构建分发表"""
+        tools = self.server._tool_manager.list_tools()
+        resources = self.server._resource_manager.list_resources()
+        templates = self.server._resource_manager.list_templates()
+        prompts = self.server._prompt_manager.list_prompts()
+
+        self.tools = {tool.name: tool.run for tool in tools}
+        self.coalesced = {tool.name: tool.fn for tool in tools if is_coalesced(tool.fn)}
+        self.prompts = {prompt.name: prompt.render for prompt in prompts}
+        self.resources = {str(resource.uri): resource for resource in resources}
+        self.templates = {
+            template.uri_template.split("://", 1)[0]: template for template in templates
+        }
+
+        self.methods = {
+            "list_tools": self.list_tools,
+            "list_resources": self.list_resources,
+            "list_prompts": self.list_prompts,
+            "call_tool": self.call_tool,
+            "read_resource": self.read_resource,
+            "get_prompt": self.get_prompt,
+        }
+        logger.info(
+            f"分发表已构建: 工具={len(self.tools)}, 资源={len(self.resources) + len(self.templates)}, "
+            f"提示模板={len(self.prompts)}"
+        )
+
+    async def dispatch(self, body: Dict[str, Any], session_id: Optional[str] = None) -> Dict[str, Any]:
+        """分发单个JSON-RPC请求"""
+        if self._stale:
+            self._stale = False
+            self.rebuild()
+
+        if not isinstance(body, dict) or not isinstance(body.get("method", ""), str):
+            response = make_error(INVALID_REQUEST, "无效请求: 请求必须是带有字符串method的对象", None)
+            metrics.observe_rpc("unknown", 0.0, response)
+            return response
+
+        method = body.get("method", "")
+        params = body.get("params") or {}
+        request_id = body.get("id", "1")
+        if not isinstance(params, dict):
+            response = make_error(INVALID_PARAMS, "无效参数: params必须是对象", request_id)
+            metrics.observe_rpc("unknown", 0.0, response)
+            return response
+
+        handler = self.methods.get(method)
+        if handler is None:
+            response = make_error(METHOD_NOT_FOUND, f"未知方法: {method}", request_id)
+            # 未知方法统一记为unknown，避免指标标签无限增长
+            metrics.observe_rpc("unknown", 0.0, response)
+            return response
+
+        start = time.perf_counter()
+        token = session_id_var.set(session_id)
+        try:
+            with tracing.span("dispatch", method=method):
+                response = await handler(params, request_id)
+        finally:
+            session_id_var.reset(token)
+        metrics.observe_rpc(method, time.perf_counter() - start, response)
+        return response
+
+    async def list_tools(self, params: Dict[str, Any], request_id: Any) -> Dict[str, Any]:
+        """返回工具列表"""
+        return make_result(self.catalog.listing("tools"), request_id)
+
+    async def list_resources(self, params: Dict[str, Any], request_id: Any) -> Dict[str, Any]:
+        """返回资源列表"""
+        return make_result(self.catalog.listing("resources"), request_id)
+
+    async def list_prompts(self, params: Dict[str, Any], request_id: Any) -> Dict[str, Any]:
+        """返回提示模板列表"""
+        return make_result(self.catalog.listing("prompts"), request_id)
+
+    async def call_tool(self, params: Dict[str, Any], request_id: Any) -> Dict[str, Any]:
+        """调用工具"""
+        tool_name = params.get("name", "")
+        arguments = params.get("parameters", params.get("arguments")) or {}
+        if not isinstance(tool_name, str) or not isinstance(arguments, dict):
+            return make_error(INVALID_PARAMS, "无效参数: name必须是字符串，arguments必须是对象", request_id)
+
+        run = self.tools.get(tool_name)
+        if run is None:
+            return make_error(METHOD_NOT_FOUND, f"未知工具: {tool_name}", request_id)
+
+        start = time.perf_counter()
+        try:
+            coalesced = self.coalesced.get(tool_name)
+            if coalesced is not None and should_coalesce(coalesced, arguments):
+                # 同一工具、规范化后相同参数的并发调用共享一次执行 (大参数不合并，见src/single_flight.py)
+                key = (tool_name, canonical_dumps(arguments))
+                shared = key in self.flights
+                if shared:
+                    metrics.TOOL_COALESCED.inc(tool_name)
+                with tracing.span("tool", tool=tool_name, shared=shared):
+                    value = await self.flights.do(key, lambda: run(arguments))
+            else:
+                with tracing.span("tool", tool=tool_name):
+                    value = await run(arguments)
+        except Exception as e:
+            metrics.TOOL_DURATION.observe(time.perf_counter() - start, tool_name)
+            metrics.TOOL_ERRORS.inc(tool_name)
+            logger.error(f"调用工具 {tool_name} 时出错: {str(e)}")
+            return make_result(
+                {
+                    "content": [{"type": "text", "text": str(e)}],
+                    "isError": True
+                },
+                request_id
+            )
+        metrics.TOOL_DURATION.observe(time.perf_counter() - start, tool_name)
+
+        return make_result(
+            {
+                "content": [{"type": "text", "text": to_text(value)}]
+            },
+            request_id
+        )
+
+    async def read_resource(self, params: Dict[str, Any], request_id: Any) -> Dict[str, Any]:
+        """读取资源"""
+        uri = params.get("uri", "")
+        if not isinstance(uri, str):
+            return make_error(INVALID_PARAMS, "无效参数: uri必须是字符串", request_id)
+
+        resource = self.resources.get(uri)
+        if resource is None:
+            scheme, _, rest = uri.partition("://")
+            template = self.templates.get(scheme)
+            uri_params = template.matches(uri) if template is not None else None
+            if uri_params is None and template is not None and len(template.parameters.get("properties", {})) == 1:
+                # 模板的URI匹配不允许参数中包含斜杠，单参数模板 (如 file://{path}) 直接取scheme后的全部内容
+                uri_params = {next(iter(template.parameters["properties"])): rest}
+            if uri_params is None:
+                return make_error(INVALID_PARAMS, f"未知资源: {uri}", request_id)
+            try:
+                resource = await template.create_resource(uri, uri_params)
+            except Exception as e:
+                return make_error(INTERNAL_ERROR, f"读取资源时出错: {str(e)}", request_id)
+
+        try:
+            data = await resource.read()
+        except Exception as e:
+            return make_error(INTERNAL_ERROR, f"读取资源时出错: {str(e)}", request_id)
+
+        content: Dict[str, Any] = {"uri": uri, "mimeType": resource.mime_type}
+        if isinstance(data, bytes):
+            content["blob"] = base64.b64encode(data).decode("ascii")
+        else:
+            content["text"] = data
+        return make_result({"contents": [content]}, request_id)
+
+    async def get_prompt(self, params: Dict[str, Any], request_id: Any) -> Dict[str, Any]:
+        """渲染提示模板"""
+        prompt_name = params.get("name", "")
+        arguments = params.get("parameters", params.get("arguments")) or {}
+        if not isinstance(prompt_name, str) or not isinstance(arguments, dict):
+            return make_error(INVALID_PARAMS, "无效参数: name必须是字符串，arguments必须是对象", request_id)
+
+        render = self.prompts.get(prompt_name)
+        if render is None:
+            return make_error(METHOD_NOT_FOUND, f"未知提示模板: {prompt_name}", request_id)
+
+        try:
+            messages = await render(arguments)
+        except Exception as e:
+            return make_error(INVALID_PARAMS, f"渲染提示模板时出错: {str(e)}", request_id)
+
+        return make_result(
+            {"messages": [message.model_dump(mode="json") for message in messages]},
+            request_id
+        )
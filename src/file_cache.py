@@ -0,0 +1,152 @@
+"""
+file:// 资源的内容缓存
+代理会反复读取相同的项目文件 (README、配置、源代码)，每次都要读磁盘并做UTF-8
+解码。整体读取的文件内容按路径缓存在进程内，用文件的 (mtime, size) 校验：
+文件未修改时再次读取只需要一次stat调用，文件被修改后下一次读取自动重新加载。
+
+- 所有缓存条目共享一个字节预算，超出时按LRU淘汰
+- 单个文件超过MCP_FILE_CACHE_MAX_ENTRY字节时不缓存
+- 可选zlib压缩：压缩后能节省至少10%时保存压缩内容，命中时需要解压和解码，
+  用CPU换内存
+- 只缓存不指定范围的整体读取；字节范围、行范围和分块读取不经过缓存
+
+stat和读取都在文件I/O线程池中执行 (见src/file_io.py)，缓存本身只在事件循环
+线程中访问，不需要加锁。
+
+配置 (环境变量):
+- MCP_FILE_CACHE_BYTES: 缓存的字节预算，默认64MB；0表示禁用缓存
+- MCP_FILE_CACHE_MAX_ENTRY: 可以缓存的最大文件字节数，默认4MB
+- MCP_FILE_CACHE_COMPRESS: zlib (压缩保存) 或 off (默认)
+"""
+from typing import Any, Dict, Optional
+from collections import OrderedDict
+import os
+import sys
+import zlib
+import logging
+
+from .file_io import file_io
+from .file_reader import read_file
+
+logger = logging.getLogger(__name__)
+
+BUDGET = int(os.environ.get("MCP_FILE_CACHE_BYTES", 64 * 1024 * 1024))
+MAX_ENTRY = int(os.environ.get("MCP_FILE_CACHE_MAX_ENTRY", 4 * 1024 * 1024))
+COMPRESS = os.environ.get("MCP_FILE_CACHE_COMPRESS", "off") == "zlib"
+
+# 压缩后至少要节省的比例
+MIN_SAVING = 0.1
+
+
+class CacheEntry:
+    """一个缓存的文件内容"""
+    __slots__ = ("mtime_ns", "size", "content", "nbytes", "compressed")
+
+    def __init__(self, mtime_ns: int, size: int, content: Any, nbytes: int, compressed: bool):
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.content = content
+        self.nbytes = nbytes
+        self.compressed = compressed
+
+    def text(self) -> str:
+        if self.compressed:
+            return zlib.decompress(self.content).decode("utf-8")
+        return self.content
+
+
+class ContentCache:
+    """按 (路径, mtime, size) 校验、按字节预算LRU淘汰的文件内容缓存"""
+
+    def __init__(self, budget: int = BUDGET, max_entry: int = MAX_ENTRY, compress: bool = COMPRESS):
+        self.budget = budget
+        self.max_entry = max_entry
+        self.compress = compress
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def enabled(self) -> bool:
+        return self.budget > 0
+
+    def _remove(self, path: str) -> None:
+        entry = self._entries.pop(path)
+        self.bytes -= entry.nbytes
+
+    def get(self, path: str, stat: os.stat_result) -> Optional[str]:
+        """文件未修改时返回缓存的内容，否则返回None"""
+        entry = self._entries.get(path)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.mtime_ns != stat.st_mtime_ns or entry.size != stat.st_size:
+            self._remove(path)
+            self.invalidations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(path)
+        self.hits += 1
+        return entry.text()
+
+    def put(self, path: str, stat: os.stat_result, text: str) -> None:
+        if not self.enabled or stat.st_size > self.max_entry:
+            return
+        content: Any = text
+        nbytes = sys.getsizeof(text)
+        compressed = False
+        if self.compress:
+            raw = text.encode("utf-8")
+            packed = zlib.compress(raw, 1)
+            if len(packed) <= len(raw) * (1 - MIN_SAVING):
+                content, nbytes, compressed = packed, sys.getsizeof(packed), True
+        if nbytes > self.budget:
+            return
+        if path in self._entries:
+            self._remove(path)
+        self._entries[path] = CacheEntry(stat.st_mtime_ns, stat.st_size, content, nbytes, compressed)
+        self.bytes += nbytes
+        while self.bytes > self.budget:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    async def read(self, file_path: str) -> str:
+        """读取整个文件，未修改的文件只需一次stat"""
+        if not self.enabled:
+            return (await file_io.run(read_file, file_path))[1]
+        stat = await file_io.run(os.stat, file_path)
+        text = self.get(file_path, stat)
+        if text is None:
+            stat, text = await file_io.run(read_file, file_path)
+            self.put(file_path, stat, text)
+        return text
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "budget": self.budget,
+            "compressed": sum(1 for entry in self._entries.values() if entry.compressed),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions
+        }
+
+
+# 全局文件内容缓存
+file_cache = ContentCache()
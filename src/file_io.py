@@ -0,0 +1,124 @@
+"""
+文件系统I/O线程池
+文件系统资源 (file://、dir://) 的处理函数是async def，但打开、读取文件和列出
+目录都是阻塞调用；直接在事件循环中执行时，一次慢速的磁盘读取会阻塞该worker
+上的所有会话。这里的所有文件操作都在专用的有界线程池中执行：
+
+    contents = await file_io.run(os.listdir, path)
+
+- 同时进行 (执行中和在线程池中排队) 的操作数有上限，超过上限的操作等待空位
+- 每个操作有超时时间 (包括等待空位)，超时后调用方收到TimeoutError；线程中
+  已经开始的系统调用无法中断，它占用的名额在真正结束后才释放，因此卡住的
+  磁盘不会让线程池中堆积越来越多的任务
+
+与工具执行的线程池 (src/scheduler.py) 分开，大量文件读取不会占满工具的线程。
+
+配置 (环境变量):
+- MCP_FILE_IO_THREADS: 线程池大小，默认8
+- MCP_FILE_IO_MAX_IN_FLIGHT: 同时进行的文件操作数上限，默认64
+- MCP_FILE_IO_TIMEOUT: 单个文件操作的超时时间 (秒)，默认10
+"""
+from typing import Any, Callable, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+import os
+import time
+import asyncio
+import logging
+
+from . import metrics, tracing
+
+logger = logging.getLogger(__name__)
+
+THREADS = int(os.environ.get("MCP_FILE_IO_THREADS", 8))
+MAX_IN_FLIGHT = int(os.environ.get("MCP_FILE_IO_MAX_IN_FLIGHT", 64))
+TIMEOUT = float(os.environ.get("MCP_FILE_IO_TIMEOUT", 10))
+
+
+class FileIO:
+    """在专用线程池中执行阻塞的文件操作"""
+
+    def __init__(self, threads: int = THREADS, max_in_flight: int = MAX_IN_FLIGHT, timeout: float = TIMEOUT):
+        self.threads = threads
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.timeouts = 0
+
+    @property
+    def pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self.threads, thread_name_prefix="mcp-file-io")
+        return self._pool
+
+    def _release(self, future: Any) -> None:
+        self.in_flight -= 1
+        self.completed += 1
+        self._slots.release()
+
+    async def run(self, func: Callable[..., Any], *args: Any, op: Optional[str] = None) -> Any:
+        """在线程池中执行func(*args)，超时抛出TimeoutError"""
+        op = op or func.__name__
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        deadline = loop.time() + self.timeout
+        try:
+            with tracing.span("file_io", op=op):
+                if self._slots.locked():
+                    self.waiting += 1
+                    try:
+                        await asyncio.wait_for(self._slots.acquire(), self.timeout)
+                    except asyncio.TimeoutError:
+                        self._timed_out(op)
+                    finally:
+                        self.waiting -= 1
+                else:
+                    await self._slots.acquire()
+                self.in_flight += 1
+                future = loop.run_in_executor(self.pool, func, *args)
+                # 名额在线程中的操作结束时释放，而不是在调用方超时或取消时
+                future.add_done_callback(self._release)
+                if not future.done():
+                    # 等待完成或超时，调用方取消时不取消线程中的操作
+                    waiter = loop.create_future()
+                    wake = lambda *_: waiter.done() or waiter.set_result(None)
+                    future.add_done_callback(wake)
+                    timer = loop.call_at(deadline, wake)
+                    try:
+                        await waiter
+                    finally:
+                        timer.cancel()
+                    if not future.done():
+                        self._timed_out(op)
+                return future.result()
+        finally:
+            metrics.FILE_IO_DURATION.observe(time.perf_counter() - start, op)
+
+    def _timed_out(self, op: str) -> None:
+        self.timeouts += 1
+        raise TimeoutError(f"File operation {op} timed out after {self.timeout:g}s")
+
+    def shutdown(self) -> None:
+        """关闭线程池 (不等待正在执行的操作)"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> Dict[str, Any]:
+        """文件I/O统计信息"""
+        return {
+            "threads": self.threads,
+            "max_in_flight": self.max_in_flight,
+            "timeout": self.timeout,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "timeouts": self.timeouts
+        }
+
+
+# 全局文件I/O线程池，服务器关闭时调用shutdown
+file_io = FileIO()
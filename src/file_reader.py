@@ -0,0 +1,230 @@
+"""
+文件的分段读取
+file:// 资源不指定范围时一次返回整个文件，几百MB的日志文件会整个读入内存，
+并且每个并发读取者各占一份。这里提供有界的读取方式：
+
+- 字节范围: file://path?offset=0&length=65536
+- 行范围: file://path?lines=100-200 (从1开始，包含两端)
+- 分块读取: iter_chunks按固定大小的缓冲区逐块读取并解码，流式会话中
+  read_resource请求带 "stream": true 时每块作为一个SSE事件发送
+
+字节范围按UTF-8字符边界对齐：字符属于其第一个字节所在的范围，因此按
+offset=0, L, 2L, ... 连续读取的各段直接拼接就是完整的文本。行范围通过mmap
+查找换行符，文件内容由操作系统按页缓存，不占用进程的堆内存。
+
+配置 (环境变量):
+- MCP_FILE_MAX_READ: 不指定范围时允许整体读取的最大文件字节数，默认16MB
+- MCP_FILE_MAX_RANGE: 单次范围读取最多返回的字节数，默认与MCP_FILE_MAX_READ相同
+- MCP_FILE_CHUNK_SIZE: 分块读取每块的字节数，默认64KB
+"""
+from typing import Iterator, Optional, Tuple
+from urllib.parse import parse_qs
+import os
+import mmap
+import codecs
+
+MAX_READ = int(os.environ.get("MCP_FILE_MAX_READ", 16 * 1024 * 1024))
+MAX_RANGE = int(os.environ.get("MCP_FILE_MAX_RANGE", MAX_READ))
+CHUNK_SIZE = int(os.environ.get("MCP_FILE_CHUNK_SIZE", 64 * 1024))
+# 查找行范围时每次统计换行符的块大小
+SCAN_BLOCK = 1024 * 1024
+
+
+class FileRange:
+    """file:// URI查询参数指定的读取范围"""
+    __slots__ = ("offset", "length", "first_line", "last_line")
+
+    def __init__(
+        self,
+        offset: int = 0,
+        length: Optional[int] = None,
+        first_line: Optional[int] = None,
+        last_line: Optional[int] = None
+    ):
+        self.offset = offset
+        self.length = length
+        self.first_line = first_line
+        self.last_line = last_line
+
+    @property
+    def whole(self) -> bool:
+        """是否读取整个文件"""
+        return self.offset == 0 and self.length is None and self.first_line is None
+
+    @classmethod
+    def parse(cls, query: str) -> "FileRange":
+        params = {key: values[-1] for key, values in parse_qs(query).items()}
+        unknown = set(params) - {"offset", "length", "lines"}
+        if unknown:
+            raise ValueError(f"Unknown file range parameters: {', '.join(sorted(unknown))}")
+        if "lines" in params:
+            if "offset" in params or "length" in params:
+                raise ValueError("lines cannot be combined with offset/length")
+            first, _, last = params["lines"].partition("-")
+            try:
+                first_line = int(first)
+                last_line = int(last) if last else first_line
+            except ValueError:
+                raise ValueError(f"Invalid line range: {params['lines']}")
+            if first_line < 1 or last_line < first_line:
+                raise ValueError(f"Invalid line range: {params['lines']}")
+            return cls(first_line=first_line, last_line=last_line)
+        try:
+            offset = int(params.get("offset", 0))
+            length = int(params["length"]) if "length" in params else None
+        except ValueError:
+            raise ValueError("offset and length must be integers")
+        if offset < 0 or (length is not None and length < 0):
+            raise ValueError("offset and length must not be negative")
+        return cls(offset, length)
+
+
+def split_query(path: str) -> Tuple[str, FileRange]:
+    """把资源路径拆分为文件路径和读取范围"""
+    path, _, query = path.partition("?")
+    return path, FileRange.parse(query) if query else FileRange()
+
+
+def resolve_path(path: str) -> str:
+    """绝对路径直接使用，相对路径基于当前工作目录"""
+    path = path.rstrip("/")
+    if path.startswith("/"):
+        return path
+    return os.path.join(os.getcwd(), path)
+
+
+def _is_continuation(byte: int) -> bool:
+    """UTF-8多字节字符的后续字节 (10xxxxxx)"""
+    return byte & 0xC0 == 0x80
+
+
+def read_bytes(file_path: str, offset: int, length: int) -> bytes:
+    """读取字节范围，两端按UTF-8字符边界对齐"""
+    if length > MAX_RANGE:
+        raise ValueError(f"Range length {length} exceeds the limit of {MAX_RANGE} bytes")
+    with open(file_path, "rb") as f:
+        f.seek(offset)
+        # 多读3个字节，用于补全跨越范围末尾的字符
+        data = f.read(length + 3)
+    start = 0
+    if offset > 0:
+        # 开头的后续字节属于上一个范围的最后一个字符
+        while start < min(3, len(data)) and _is_continuation(data[start]):
+            start += 1
+    end = min(length, len(data))
+    while end < len(data) and _is_continuation(data[end]):
+        end += 1
+    return data[start:max(start, end)]
+
+
+def _skip_lines(data: mmap.mmap, start: int, count: int) -> int:
+    """从start开始跳过count行，返回之后的位置；行数不足时返回-1
+
+    按块统计换行符数量，整块都要跳过时不逐行查找。
+    """
+    size = len(data)
+    while count and start < size:
+        block = data[start:start + SCAN_BLOCK]
+        newlines = block.count(b"\n")
+        if newlines < count:
+            count -= newlines
+            start += len(block)
+            continue
+        position = -1
+        for _ in range(count):
+            position = block.find(b"\n", position + 1)
+        return start + position + 1
+    return start if count == 0 else -1
+
+
+def read_lines(file_path: str, first_line: int, last_line: int) -> bytes:
+    """通过mmap读取行范围 (从1开始，包含两端)"""
+    with open(file_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return b""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            start = _skip_lines(data, 0, first_line - 1)
+            if start < 0 or start >= size:
+                return b""
+            # 只在不超过MAX_RANGE的窗口内查找范围的结尾
+            window = min(size, start + MAX_RANGE + 1)
+            end = data.find(b"\n", start, window)
+            for _ in range(last_line - first_line):
+                if end < 0:
+                    break
+                end = data.find(b"\n", end + 1, window)
+            end = window if end < 0 else end + 1
+            if end - start > MAX_RANGE:
+                raise ValueError(f"Line range exceeds the limit of {MAX_RANGE} bytes")
+            return data[start:end]
+
+
+def read_file(file_path: str) -> Tuple[os.stat_result, str]:
+    """读取整个文件 (不超过MAX_READ)，同时返回读取时打开的文件的stat信息"""
+    with open(file_path, "r", encoding="utf-8") as f:
+        stat = os.fstat(f.fileno())
+        if stat.st_size > MAX_READ:
+            raise ValueError(
+                f"File is {stat.st_size} bytes, larger than the {MAX_READ} byte limit for whole-file reads; "
+                f"use ?offset=&length= or ?lines= ranges, or stream the resource"
+            )
+        return stat, f.read()
+
+
+def read_text(file_path: str, file_range: FileRange) -> str:
+    """按范围读取文本，不指定范围时读取整个文件 (不超过MAX_READ)"""
+    if file_range.first_line is not None:
+        return read_lines(file_path, file_range.first_line, file_range.last_line).decode("utf-8", errors="replace")
+    if file_range.whole:
+        return read_file(file_path)[1]
+    length = file_range.length if file_range.length is not None else MAX_RANGE
+    return read_bytes(file_path, file_range.offset, length).decode("utf-8", errors="replace")
+
+
+def iter_chunks(
+    file_path: str,
+    offset: int = 0,
+    length: Optional[int] = None,
+    chunk_size: int = CHUNK_SIZE
+) -> Iterator[Tuple[int, int, str]]:
+    """逐块读取文本，产出 (本块起始偏移, 本块字节数, 文本)
+
+    使用固定大小的缓冲区和增量解码器，跨块的多字节字符在下一块中输出，
+    任何时候内存中只有一块数据。
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    remaining = length
+    # 从字符中间开始时跳过开头的后续字节 (最多3个)，与read_bytes的对齐方式一致
+    skip = 3 if offset > 0 else 0
+    with open(file_path, "rb", buffering=0) as f:
+        f.seek(offset)
+        while remaining is None or remaining > 0:
+            size = chunk_size if remaining is None else min(chunk_size, remaining)
+            count = f.readinto(view[:size])
+            if not count:
+                break
+            start = 0
+            while skip and start < count and _is_continuation(buffer[start]):
+                start += 1
+                skip -= 1
+            if start < count:
+                skip = 0
+            yield offset, count, decoder.decode(view[start:count])
+            offset += count
+            if remaining is not None:
+                remaining -= count
+        pending = decoder.getstate()[0]
+        if pending and remaining == 0:
+            # 范围末尾的字符跨越了边界，补读它的后续字节
+            extra = f.read(3)
+            end = 0
+            while end < len(extra) and _is_continuation(extra[end]):
+                end += 1
+            tail = decoder.decode(extra[:end], final=True)
+        else:
+            tail = decoder.decode(b"", final=True)
+    if tail:
+        yield offset, 0, tail
@@ -9,7 +9,7 @@ from src.mcp_server import mcp
 from src.resources import filesystem  # 直接导入filesystem模块
 
 # 导入所有工具模块
-from src.tools import calculator, user
+from src.tools import calculator, accumulator, user, health
 
 # 导入所有提示模块
 from src.prompts import code_review, git_helper, api_design
@@ -19,12 +19,6 @@ import uvicorn
 from uvicorn.config import Config
 from uvicorn.server import Server
 
-# 添加健康检查工具
-@mcp.tool()
-async def health() -> dict:
-    """健康检查工具"""
-    return {"status": "ok", "service": "crew-ai-mcp"}
-
 def main():
     """启动MCP服务器"""
     # 从Heroku PORT环境变量获取端口
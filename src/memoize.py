@@ -0,0 +1,193 @@
+"""
+工具结果缓存
+计算工具、validate_user和提示模板的结果只由参数决定，多个代理反复发送相同
+的调用时不必每次重新计算。在mcp.tool()或mcp.prompt()下面叠加@memoized()
+即可缓存函数的结果：
+
+    @mcp.tool()
+    @memoized(ttl=600)
+    async def validate_user(user_id: str) -> bool:
+        ...
+
+- 缓存键: 参数按函数签名绑定 (补齐默认值) 后规范化编码 (字典键排序，
+  pydantic模型按字段内容)，再取BLAKE2b摘要；位置参数和关键字参数、
+  列表和编码数组形式的相同参数得到不同的键，只是少命中一次
+- 淘汰: 每个函数一个LRU，按条目数和结果的序列化字节数双重限制，
+  条目超过ttl秒后过期；单个结果超过字节上限的1/4时不缓存
+- when: 可选的判断函数，接收与函数相同的参数，返回False时不查缓存也不缓存
+  (例如很大的输入计算摘要的开销接近重新计算)
+- 抛出异常的调用不缓存
+
+缓存的结果会被多个调用方共享，调用方不能修改返回的对象。
+与@scheduled()同时使用时放在它上面，命中缓存的调用不占用执行池和并发名额。
+缓存只存在于当前worker进程中。
+
+配置 (环境变量):
+- MCP_MEMO: 设为off时禁用所有结果缓存
+- MCP_MEMO_MAX_ENTRIES: 每个函数默认最多缓存的结果数，默认1024
+- MCP_MEMO_MAX_BYTES: 每个函数默认的缓存字节数上限，默认8MB
+- MCP_MEMO_TTL: 默认过期时间 (秒)，默认300；0表示不过期
+"""
+from typing import Any, Callable, Dict, Optional, Tuple
+from collections import OrderedDict
+import os
+import time
+import hashlib
+import inspect
+import logging
+import functools
+
+from .serializer import dumps, canonical_dumps
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.environ.get("MCP_MEMO", "on").lower() not in ("off", "0", "false")
+MAX_ENTRIES = int(os.environ.get("MCP_MEMO_MAX_ENTRIES", 1024))
+MAX_BYTES = int(os.environ.get("MCP_MEMO_MAX_BYTES", 8 * 1024 * 1024))
+TTL = float(os.environ.get("MCP_MEMO_TTL", 300))
+
+_MISSING = object()
+
+
+def result_size(value: Any) -> int:
+    """结果的字节大小，按JSON编码长度估算"""
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    try:
+        return len(dumps(value))
+    except TypeError:
+        return len(repr(value))
+
+
+class ResultCache:
+    """按条目数和字节数限制的LRU缓存，条目带过期时间"""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES, ttl: float = TTL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # 键 -> (过期时间, 字节数, 结果)
+        self._entries: "OrderedDict[bytes, Tuple[float, int, Any]]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.skipped = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: bytes) -> Any:
+        """查找结果，未命中或已过期时返回_MISSING"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return _MISSING
+        expires, size, value = entry
+        if expires and expires <= time.monotonic():
+            del self._entries[key]
+            self.bytes -= size
+            self.expirations += 1
+            self.misses += 1
+            return _MISSING
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: bytes, value: Any) -> None:
+        size = result_size(value)
+        if size > self.max_bytes // 4:
+            self.skipped += 1
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.bytes -= old[1]
+        expires = time.monotonic() + self.ttl if self.ttl > 0 else 0.0
+        self._entries[key] = (expires, size, value)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self.bytes -= evicted_size
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "skipped": self.skipped
+        }
+
+
+# 函数名 -> 结果缓存
+caches: Dict[str, ResultCache] = {}
+
+
+def stats() -> Dict[str, Any]:
+    """所有结果缓存的统计信息"""
+    return {
+        "enabled": ENABLED,
+        "functions": {name: cache.stats() for name, cache in caches.items()}
+    }
+
+
+def clear() -> None:
+    """清空所有结果缓存 (统计计数保留)"""
+    for cache in caches.values():
+        cache.clear()
+
+
+def memoized(
+    ttl: Optional[float] = None,
+    max_entries: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    when: Optional[Callable[..., bool]] = None
+) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """缓存函数的结果，放在mcp.tool()或mcp.prompt()下面"""
+
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        if not ENABLED:
+            return func
+        name = func.__name__
+        signature = inspect.signature(func)
+        cache = caches.setdefault(name, ResultCache(
+            max_entries if max_entries is not None else MAX_ENTRIES,
+            max_bytes if max_bytes is not None else MAX_BYTES,
+            ttl if ttl is not None else TTL
+        ))
+
+        def make_key(args: tuple, kwargs: Dict[str, Any]) -> bytes:
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return hashlib.blake2b(canonical_dumps(bound.arguments), digest_size=16).digest()
+
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if when is not None and not when(*args, **kwargs):
+                result = func(*args, **kwargs)
+                if inspect.isawaitable(result):
+                    result = await result
+                return result
+            key = make_key(args, kwargs)
+            result = cache.get(key)
+            if result is not _MISSING:
+                return result
+            result = func(*args, **kwargs)
+            if inspect.isawaitable(result):
+                result = await result
+            cache.put(key, result)
+            return result
+
+        wrapper.cache = cache
+        return wrapper
+    return decorator
@@ -0,0 +1,232 @@
+"""
+Prometheus格式的运行指标
+计数器和直方图都是普通的字典和列表，所有记录都发生在事件循环线程中，
+不需要加锁；直方图按固定分桶计数，记录一次只是一次二分查找和几次整数加法。
+会话数、SSE长连接数和重放缓冲区大小等当前值在抓取 /metrics 时通过回调计算。
+
+每个worker进程有各自的指标，多worker部署时由Prometheus按实例汇总。
+"""
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Sequence, Tuple
+from bisect import bisect_left
+import math
+import time
+import functools
+
+# 请求延迟分桶 (秒)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = Tuple[str, ...]
+
+
+def format_value(value: float) -> str:
+    """按Prometheus文本格式输出数值"""
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def escape_label(value: Any) -> str:
+    """转义标签值中的反斜杠、双引号和换行"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names: Sequence[str], values: Iterable[Any]) -> str:
+    """输出 {name="value",...}，没有标签时返回空字符串"""
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """指标基类"""
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """只增不减的计数器"""
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        values = self.values
+        values[labels] = values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{format_labels(self.labelnames, labels)} {format_value(value)}"
+            for labels, value in self.values.items()
+        ]
+
+
+class Histogram(Metric):
+    """固定分桶的直方图，每个标签组合保存各分桶的计数、总和与次数"""
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 标签 -> [各分桶计数..., +Inf分桶计数, 总和]
+        self.series: Dict[Labels, List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        bounds = [format_value(bound) for bound in self.buckets] + ["+Inf"]
+        names = self.labelnames + ("le",)
+        for labels, series in self.series.items():
+            cumulative = 0
+            for bound, count in zip(bounds, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{format_labels(names, labels + (bound,))} {int(cumulative)}")
+            label_text = format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {format_value(series[-1])}")
+            lines.append(f"{self.name}_count{label_text} {int(cumulative)}")
+        return lines
+
+
+class CallbackMetric(Metric):
+    """抓取时通过回调计算的指标，回调返回数值或 {标签元组: 数值}"""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        collect: Callable[[], Any],
+        labelnames: Sequence[str] = (),
+        type: str = "gauge"
+    ):
+        super().__init__(name, help, labelnames)
+        self.collect = collect
+        self.type = type
+
+    def samples(self) -> List[str]:
+        values = self.collect()
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [
+            f"{self.name}{format_labels(self.labelnames, labels)} {format_value(value)}"
+            for labels, value in values.items()
+        ]
+
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def callback(self, name: str, help: str, collect: Callable[[], Any], labelnames: Sequence[str] = (), type: str = "gauge") -> CallbackMetric:
+        return self.register(CallbackMetric(name, help, collect, labelnames, type))
+
+    def render(self) -> str:
+        """以Prometheus文本格式输出所有指标"""
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+# HTTP层：POST /mcp
+HTTP_REQUESTS = REGISTRY.counter(
+    "mcp_http_requests_total", "POST /mcp请求数", ("status",)
+)
+HTTP_DURATION = REGISTRY.histogram(
+    "mcp_http_request_duration_seconds", "POST /mcp处理耗时 (流式响应只计算到响应开始)", ("status",)
+)
+# 批量或单个请求的处理耗时 (process_request)
+PROCESS_DURATION = REGISTRY.histogram(
+    "mcp_process_request_duration_seconds", "process_request耗时", ("kind",)
+)
+# JSON-RPC层：每个方法调用
+RPC_REQUESTS = REGISTRY.counter(
+    "mcp_rpc_requests_total", "JSON-RPC请求数", ("method",)
+)
+RPC_ERRORS = REGISTRY.counter(
+    "mcp_rpc_errors_total", "JSON-RPC错误响应数", ("method", "code")
+)
+RPC_DURATION = REGISTRY.histogram(
+    "mcp_rpc_duration_seconds", "JSON-RPC方法处理耗时", ("method",)
+)
+# 工具调用
+TOOL_DURATION = REGISTRY.histogram(
+    "mcp_tool_duration_seconds", "工具执行耗时", ("tool",)
+)
+TOOL_ERRORS = REGISTRY.counter(
+    "mcp_tool_errors_total", "工具执行出错次数", ("tool",)
+)
+TOOL_COALESCED = REGISTRY.counter(
+    "mcp_tool_coalesced_total", "与正在执行的相同调用合并的工具调用数", ("tool",)
+)
+# 文件系统资源的I/O (src/file_io.py)
+FILE_IO_DURATION = REGISTRY.histogram(
+    "mcp_file_io_duration_seconds", "文件操作耗时 (包括等待线程池名额)", ("op",)
+)
+# SSE发送
+SSE_EVENTS = REGISTRY.counter(
+    "mcp_sse_events_sent_total", "已发送的SSE事件数", ("stream",)
+)
+SSE_BYTES = REGISTRY.counter(
+    "mcp_sse_bytes_sent_total", "已发送的SSE字节数 (不含心跳)", ("stream",)
+)
+
+
+def observe_rpc(method: str, duration: float, response: Any) -> None:
+    """记录一次JSON-RPC方法调用的耗时和错误码"""
+    RPC_REQUESTS.inc(method)
+    RPC_DURATION.observe(duration, method)
+    if isinstance(response, dict):
+        error = response.get("error")
+        if error is not None:
+            RPC_ERRORS.inc(method, str(error.get("code")))
+
+
+def timed_http(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """记录HTTP处理函数的请求数和耗时，按响应状态码分组"""
+    @functools.wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        response = await func(*args, **kwargs)
+        status = str(response.status_code)
+        HTTP_REQUESTS.inc(status)
+        HTTP_DURATION.observe(time.perf_counter() - start, status)
+        return response
+    return wrapper
+
+
+def render() -> str:
+    """以Prometheus文本格式输出全局注册表中的所有指标"""
+    return REGISTRY.render()
@@ -0,0 +1,14 @@
+"""
+请求上下文
+分发器在调用处理函数前设置当前请求的会话ID，工具函数通过current_session_id()
+读取，不需要修改工具的参数。批量请求中并发执行的子任务各自继承自己的上下文。
+"""
+from typing import Optional
+from contextvars import ContextVar
+
+session_id_var: ContextVar[Optional[str]] = ContextVar("mcp_session_id", default=None)
+
+
+def current_session_id() -> Optional[str]:
+    """当前请求所属的会话ID，没有会话时返回None"""
+    return session_id_var.get()
@@ -0,0 +1,196 @@
+"""
+结构化请求日志
+日志记录通过QueueHandler交给后台线程格式化和输出，请求处理协程只负责把
+LogRecord放入队列；消息和结构化字段在后台线程中才拼接成文本或JSON。
+INFO及以下级别的请求日志可以按路由 (JSON-RPC方法名) 采样，警告和错误总是记录。
+
+配置 (环境变量):
+- MCP_LOG_LEVEL: 日志级别，默认INFO
+- MCP_LOG_FORMAT: text (默认) 或 json
+- MCP_LOG_ASYNC: 是否通过后台线程输出，默认1
+- MCP_LOG_SAMPLE: 按路由的采样率，例如 "call_tool=0.1,list_tools=0.01,*=1"
+"""
+from typing import Any, Dict, Optional
+import os
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+
+LOG_LEVEL = os.environ.get("MCP_LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("MCP_LOG_FORMAT", "text")
+LOG_ASYNC = os.environ.get("MCP_LOG_ASYNC", "1").lower() in ("1", "true", "yes")
+LOG_SAMPLE = os.environ.get("MCP_LOG_SAMPLE", "")
+
+TEXT_FORMAT = "%(levelname)s:%(name)s:%(message)s"
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """解析 "路由=采样率,..." 格式的采样配置，"*" 表示其他所有路由"""
+    rates: Dict[str, float] = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        route, _, rate = part.partition("=")
+        try:
+            rates[route.strip()] = min(max(float(rate), 0.0), 1.0)
+        except ValueError:
+            raise ValueError(f"无效的日志采样配置: {part}")
+    return rates
+
+
+class TextFormatter(logging.Formatter):
+    """文本格式：消息后追加 key=value 形式的结构化字段"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            text += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return text
+
+
+class JSONFormatter(logging.Formatter):
+    """JSON格式：每条日志一行JSON，结构化字段作为顶层键"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """不在调用线程中格式化的QueueHandler
+
+    标准库的QueueHandler.prepare()会在调用线程中拼接消息 (为了能跨进程传递)，
+    这里的队列只在进程内使用，LogRecord原样交给后台线程格式化。
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_logging(
+    level: str = LOG_LEVEL,
+    fmt: str = LOG_FORMAT,
+    use_async: bool = LOG_ASYNC,
+    stream: Any = None,
+    force: bool = False
+) -> None:
+    """配置根日志记录器，与logging.basicConfig一样已有处理器时不做修改 (除非force)"""
+    global _listener
+    root = logging.getLogger()
+    if root.handlers and not force:
+        return
+    stop_logging()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JSONFormatter() if fmt == "json" else TextFormatter(TEXT_FORMAT))
+
+    if use_async:
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+        _listener.start()
+        root.addHandler(DeferredQueueHandler(log_queue))
+    else:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+def stop_logging() -> None:
+    """停止后台日志线程，输出队列中剩余的记录"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
+
+
+class RouteLog:
+    """绑定到单个请求的日志记录器
+
+    采样在请求开始时决定一次，同一请求的INFO/DEBUG日志要么全部记录，要么全部跳过；
+    跳过时不会构建LogRecord。字段作为LogRecord的属性传递，在后台线程中才格式化。
+    """
+    __slots__ = ("logger", "route", "sampled")
+
+    def __init__(self, logger: logging.Logger, route: str, sampled: bool):
+        self.logger = logger
+        self.route = route
+        self.sampled = sampled
+
+    def _log(self, level: int, msg: str, fields: Dict[str, Any], exc_info: Any = None) -> None:
+        fields["route"] = self.route
+        if exc_info is True:
+            exc_info = sys.exc_info()
+        # 直接构建LogRecord，跳过Logger._log中查找调用位置的栈遍历
+        record = self.logger.makeRecord(
+            self.logger.name, level, "(request)", 0, msg, (), exc_info, extra={"fields": fields}
+        )
+        self.logger.handle(record)
+
+    def debug(self, msg: str, **fields: Any) -> None:
+        if self.sampled and self.logger.isEnabledFor(logging.DEBUG):
+            self._log(logging.DEBUG, msg, fields)
+
+    def info(self, msg: str, **fields: Any) -> None:
+        if self.sampled:
+            self._log(logging.INFO, msg, fields)
+
+    def warning(self, msg: str, **fields: Any) -> None:
+        if self.logger.isEnabledFor(logging.WARNING):
+            self._log(logging.WARNING, msg, fields)
+
+    def error(self, msg: str, exc_info: Any = None, **fields: Any) -> None:
+        if self.logger.isEnabledFor(logging.ERROR):
+            self._log(logging.ERROR, msg, fields, exc_info)
+
+
+class RequestLog:
+    """按路由采样的请求日志"""
+
+    def __init__(self, logger: logging.Logger, sample_rates: Optional[Dict[str, float]] = None):
+        self.logger = logger
+        self.sample_rates = parse_sample_rates(LOG_SAMPLE) if sample_rates is None else sample_rates
+        self.default_rate = self.sample_rates.get("*", 1.0)
+        self.sampled = 0
+        self.skipped = 0
+
+    def route(self, route: str) -> RouteLog:
+        """为一个请求决定是否采样，返回绑定的日志记录器"""
+        if not self.logger.isEnabledFor(logging.INFO):
+            return RouteLog(self.logger, route, False)
+        rate = self.sample_rates.get(route, self.default_rate)
+        sampled = rate >= 1.0 or (rate > 0.0 and random.random() < rate)
+        if sampled:
+            self.sampled += 1
+        else:
+            self.skipped += 1
+        return RouteLog(self.logger, route, sampled)
+
+    def stats(self) -> Dict[str, Any]:
+        """采样统计信息"""
+        return {
+            "sampled": self.sampled,
+            "skipped": self.skipped,
+            "sample_rates": self.sample_rates,
+            "async": _listener is not None
+        }
@@ -1,49 +1,76 @@
 """
 文件系统资源模块
 提供文件系统相关的资源访问功能
+所有文件操作都在专用的I/O线程池中执行，不阻塞事件循环 (见src/file_io.py)
 """
-import os
 import logging
 from urllib.parse import urlparse
 from ..mcp_server import mcp
+from ..file_reader import split_query, resolve_path, read_text
+from ..file_io import file_io
+from ..file_cache import file_cache
+from ..serializer import dumps
+from .. import dir_listing, tree_walk
 
-@mcp.resource("dir://{path}")
+logger = logging.getLogger(__name__)
+
+@mcp.resource("dir://{path}", mime_type="application/json")
 async def get_directory_contents(path: str) -> str:
     """获取指定目录的内容
     
+    返回JSON格式的一页目录条目 (名称、类型、大小、修改时间)，按名称排序。
+    可以在URI后用查询参数分页和过滤 (见src/dir_listing.py)：
+    ?limit=100&glob=*.py，下一页再加上 &cursor=<nextCursor>
+    
+    出错时抛出异常，由read_resource返回JSON-RPC错误，而不是返回非JSON的文本内容。
+    
     Args:
         path: 目录路径
     """
-    try:
-        print(f"获取目录内容: {path}")
-        contents = os.listdir(path)
-        return "\n".join(contents)
-    except Exception as e:
-        return f"Error accessing directory: {str(e)}"
+    print(f"获取目录内容: {path}")
+    path, query = dir_listing.split_query(path)
+    listing = await file_io.run(dir_listing.list_directory, path, query)
+    return dumps(listing).decode("utf-8")
+
+@mcp.resource("tree://{path}", mime_type="application/json")
+async def get_directory_tree(path: str) -> str:
+    """递归获取目录树
+
+    返回JSON格式的整个目录树清单，条目带相对于根目录的路径，按路径排序。
+    目录并行扫描，可以用查询参数限制深度、条目数和忽略规则 (见src/tree_walk.py)：
+    ?max_depth=3&max_entries=5000&ignore=*.pyc,dist&gitignore=0
+    流式会话中read_resource带 "stream": true 时分批发送。
+    出错时抛出异常，由read_resource返回JSON-RPC错误。
+
+    Args:
+        path: 根目录路径
+    """
+    logger.debug(f"遍历目录树: {path}")
+    path, query = tree_walk.split_query(path)
+    return dumps(await tree_walk.TreeWalk(resolve_path(path), query).collect()).decode("utf-8")
 
 @mcp.resource("file://{path}")
 async def get_file_contents(path: str) -> str:
     """获取文件内容
     
+    可以在URI后用查询参数指定读取范围 (见src/file_reader.py)：
+    ?offset=0&length=65536 读取字节范围，?lines=100-200 读取行范围。
+    不指定范围时文件不能超过MCP_FILE_MAX_READ字节。
+    
     Args:
         path: 文件路径
     """
     try:
-        # 移除路径末尾可能存在的斜杠
-        path = path.rstrip('/')
         print(f"读取文件 (原始路径): {path}")
+        path, file_range = split_query(path)
         
-        # 处理标准形式的file://path格式
-        if path.startswith('/'):
-            # 已经是绝对路径，直接使用
-            file_path = path
-        else:
-            # 相对路径，基于当前工作目录
-            file_path = os.path.join(os.getcwd(), path)
-        
+        # 处理标准形式的file://path格式：绝对路径直接使用，相对路径基于当前工作目录
+        file_path = resolve_path(path)
         print(f"解析后的文件路径: {file_path}")
         
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return f.read()
+        if file_range.whole:
+            # 整体读取经过内容缓存，文件未修改时只需一次stat (见src/file_cache.py)
+            return await file_cache.read(file_path)
+        return await file_io.run(read_text, file_path, file_range)
     except Exception as e:
-        return f"Error reading file: {str(e)}" 
\ No newline at end of file
+        return f"Error reading file: {str(e)}"
@@ -0,0 +1,200 @@
+"""
+工具执行调度
+工具函数都是async def，但CPU密集的计算或阻塞I/O直接在事件循环中执行时会
+阻塞所有会话 (SSE推送、健康检查等)。在mcp.tool()下面叠加@scheduled()即可
+指定工具的执行方式：
+
+    @mcp.tool()
+    @scheduled(cpu_bound=True, max_concurrency=2, timeout=30)
+    async def calculate_stats(numbers: Numbers) -> dict:
+        ...
+
+- cpu_bound: 在进程池中执行 (工具必须是模块级函数，参数和返回值可以pickle)
+- blocking_io: 在线程池中执行
+- when: 可选的判断函数，接收与工具相同的参数，返回False时仍在事件循环中直接执行
+  (例如小输入的计算比跨进程传递参数还快)
+- max_concurrency: 该工具同时执行的最大数量，超出的调用排队等待
+- timeout: 超时时间 (秒，包括排队等待)，超时后调用方收到错误；进程池中已经
+  开始执行的任务无法中断，会在后台执行完毕
+
+配置 (环境变量):
+- MCP_PROCESS_WORKERS: 进程池大小，默认CPU核数；0表示不使用进程池，cpu_bound工具改用线程池
+- MCP_IO_THREADS: 线程池大小，默认8
+"""
+from typing import Any, Callable, Dict, Optional
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import os
+import asyncio
+import inspect
+import logging
+import functools
+import importlib
+import contextvars
+import multiprocessing
+
+from . import tracing
+
+logger = logging.getLogger(__name__)
+
+PROCESS_WORKERS = int(os.environ.get("MCP_PROCESS_WORKERS", os.cpu_count() or 1))
+IO_THREADS = int(os.environ.get("MCP_IO_THREADS", 8))
+
+
+def call_sync(func: Callable[..., Any], args: tuple, kwargs: Dict[str, Any]) -> Any:
+    """在当前线程中调用工具函数，协程函数使用新的事件循环执行"""
+    result = func(*args, **kwargs)
+    if inspect.iscoroutine(result):
+        result = asyncio.run(result)
+    return result
+
+
+def run_in_worker(module: str, qualname: str, args: tuple, kwargs: Dict[str, Any]) -> Any:
+    """进程池中执行的入口：按模块名和函数名找到工具的原始函数并调用"""
+    func = getattr(importlib.import_module(module), qualname)
+    while not hasattr(func, "_scheduled_func"):
+        func = func.__wrapped__
+    return call_sync(func._scheduled_func, args, kwargs)
+
+
+class ToolStats:
+    """单个工具的调度统计"""
+    __slots__ = ("running", "queued", "completed", "offloaded", "timeouts")
+
+    def __init__(self):
+        self.running = 0
+        self.queued = 0
+        self.completed = 0
+        self.offloaded = 0
+        self.timeouts = 0
+
+    def to_dict(self) -> Dict[str, int]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class Scheduler:
+    """管理进程池和线程池，延迟到第一次使用时创建"""
+
+    def __init__(self, process_workers: int = PROCESS_WORKERS, io_threads: int = IO_THREADS):
+        self.process_workers = process_workers
+        self.io_threads = io_threads
+        self._process_pool: Optional[Executor] = None
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self.tools: Dict[str, ToolStats] = {}
+
+    @property
+    def thread_pool(self) -> ThreadPoolExecutor:
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(self.io_threads, thread_name_prefix="mcp-tool")
+        return self._thread_pool
+
+    @property
+    def process_pool(self) -> Optional[Executor]:
+        """进程池，不可用或被禁用时返回None"""
+        if self._process_pool is None and self.process_workers > 0:
+            try:
+                # spawn方式启动的子进程不继承父进程的线程和锁 (日志线程、SQLite连接等)
+                context = multiprocessing.get_context("spawn")
+                self._process_pool = ProcessPoolExecutor(self.process_workers, mp_context=context)
+            except (OSError, NotImplementedError) as e:
+                logger.warning(f"无法创建进程池，CPU密集的工具改用线程池执行: {str(e)}")
+                self.process_workers = 0
+        return self._process_pool
+
+    async def run_in_process(self, func: Callable[..., Any], args: tuple, kwargs: Dict[str, Any]) -> Any:
+        pool = self.process_pool
+        if pool is None:
+            return await self.run_in_thread(func, args, kwargs)
+        loop = asyncio.get_running_loop()
+        with tracing.span("offload", pool="process"):
+            return await loop.run_in_executor(
+                pool, run_in_worker, func.__module__, func.__qualname__, args, kwargs
+            )
+
+    async def run_in_thread(self, func: Callable[..., Any], args: tuple, kwargs: Dict[str, Any]) -> Any:
+        loop = asyncio.get_running_loop()
+        # 复制上下文，工具在线程中也能读取当前会话ID
+        context = contextvars.copy_context()
+        with tracing.span("offload", pool="thread"):
+            return await loop.run_in_executor(
+                self.thread_pool, functools.partial(context.run, call_sync, func, args, kwargs)
+            )
+
+    def shutdown(self) -> None:
+        """关闭进程池和线程池 (不等待正在执行的任务)"""
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=False, cancel_futures=True)
+            self._thread_pool = None
+
+    def stats(self) -> Dict[str, Any]:
+        """调度统计信息"""
+        return {
+            "process_workers": self.process_workers,
+            "io_threads": self.io_threads,
+            "tools": {name: stats.to_dict() for name, stats in self.tools.items()}
+        }
+
+
+# 全局调度器，服务器关闭时调用shutdown
+scheduler = Scheduler()
+
+
+def scheduled(
+    cpu_bound: bool = False,
+    blocking_io: bool = False,
+    when: Optional[Callable[..., bool]] = None,
+    max_concurrency: Optional[int] = None,
+    timeout: Optional[float] = None
+) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """指定工具的执行方式，放在mcp.tool()下面"""
+    if cpu_bound and blocking_io:
+        raise ValueError("cpu_bound和blocking_io不能同时指定")
+
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        if cpu_bound and "<locals>" in func.__qualname__:
+            raise ValueError(f"CPU密集的工具必须是模块级函数: {func.__qualname__}")
+        name = func.__name__
+        stats = scheduler.tools.setdefault(name, ToolStats())
+        semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+        async def execute(args: tuple, kwargs: Dict[str, Any]) -> Any:
+            if semaphore is not None:
+                stats.queued += 1
+                try:
+                    await semaphore.acquire()
+                finally:
+                    stats.queued -= 1
+            stats.running += 1
+            try:
+                offload = when is None or when(*args, **kwargs)
+                if offload and cpu_bound:
+                    stats.offloaded += 1
+                    return await scheduler.run_in_process(func, args, kwargs)
+                if offload and blocking_io:
+                    stats.offloaded += 1
+                    return await scheduler.run_in_thread(func, args, kwargs)
+                result = func(*args, **kwargs)
+                if inspect.isawaitable(result):
+                    result = await result
+                return result
+            finally:
+                stats.running -= 1
+                stats.completed += 1
+                if semaphore is not None:
+                    semaphore.release()
+
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if timeout is None:
+                return await execute(args, kwargs)
+            try:
+                return await asyncio.wait_for(execute(args, kwargs), timeout)
+            except asyncio.TimeoutError:
+                stats.timeouts += 1
+                raise TimeoutError(f"Tool {name} timed out after {timeout:g}s")
+
+        wrapper._scheduled_func = func
+        return wrapper
+    return decorator
@@ -0,0 +1,88 @@
+"""
+JSON序列化
+安装了orjson时使用orjson，否则回退到标准库json。
+所有编码结果都是UTF-8字节，可以直接写入响应，无需中间字符串。
+"""
+from typing import Any, Optional, Union
+import os
+import json
+import logging
+
+from fastapi.responses import Response
+
+from . import tracing
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 设置MCP_JSON_BACKEND=json可以强制使用标准库
+BACKEND = "orjson" if orjson is not None and os.environ.get("MCP_JSON_BACKEND", "orjson") == "orjson" else "json"
+
+
+def _std_dumps(data: Any) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _canonical_default(value: Any) -> Any:
+    """规范化编码中orjson/json不直接支持的类型"""
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=repr)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def _std_canonical_dumps(data: Any) -> bytes:
+    return json.dumps(
+        data, ensure_ascii=False, separators=(",", ":"), sort_keys=True, default=_canonical_default
+    ).encode("utf-8")
+
+
+if BACKEND == "orjson":
+    def dumps(data: Any) -> bytes:
+        """将对象编码为紧凑的JSON字节"""
+        try:
+            return orjson.dumps(data)
+        except TypeError:
+            # orjson不支持的类型 (例如超过64位的整数)，回退到标准库
+            return _std_dumps(data)
+
+    def loads(data: Union[bytes, str]) -> Any:
+        """解析JSON字节或字符串"""
+        return orjson.loads(data)
+
+    def canonical_dumps(data: Any) -> bytes:
+        """规范化编码：字典键排序，pydantic模型和NumPy数组按内容编码，用作缓存键"""
+        try:
+            return orjson.dumps(data, default=_canonical_default, option=orjson.OPT_SORT_KEYS)
+        except TypeError:
+            return _std_canonical_dumps(data)
+else:
+    dumps = _std_dumps
+    canonical_dumps = _std_canonical_dumps
+
+    def loads(data: Union[bytes, str]) -> Any:
+        """解析JSON字节或字符串"""
+        return json.loads(data)
+
+
+def encode_sse(data: Any, event_id: Optional[int] = None) -> bytes:
+    """将对象编码为一个完整的SSE事件，可选带事件ID"""
+    if event_id is None:
+        return b"data: " + dumps(data) + b"\n\n"
+    return b"id: %d\ndata: " % event_id + dumps(data) + b"\n\n"
+
+
+class FastJSONResponse(Response):
+    """使用当前序列化后端的JSON响应"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        with tracing.span("serialize"):
+            return dumps(content)
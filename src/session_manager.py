@@ -0,0 +1,260 @@
+"""
+会话管理
+有界的会话存储：空闲超时淘汰、最大会话数LRU淘汰、后台定期清理，
+并统计会话的创建、淘汰数量和内存占用
+"""
+from typing import Dict, Any, Optional, Callable, List, Tuple
+from collections import OrderedDict
+import os
+import sys
+import time
+import uuid
+import asyncio
+import logging
+
+from .session_store import SessionStore, MemorySessionStore, create_store
+
+logger = logging.getLogger(__name__)
+
+# 会话空闲超时 (秒)
+SESSION_TTL = float(os.environ.get("MCP_SESSION_TTL", 1800))
+# 最大会话数，超过后淘汰最久未使用的会话
+MAX_SESSIONS = int(os.environ.get("MCP_MAX_SESSIONS", 1000))
+# 后台清理间隔 (秒)
+SWEEP_INTERVAL = float(os.environ.get("MCP_SESSION_SWEEP_INTERVAL", 60))
+
+
+def session_memory(session: Dict[str, Any]) -> int:
+    """估算单个会话占用的内存字节数 (会话字典及其中对象报告的占用，例如SSE通道重放缓冲区中的事件)"""
+    size = sys.getsizeof(session)
+    for key, value in session.items():
+        size += sys.getsizeof(key) + sys.getsizeof(value)
+        memory_size = getattr(value, "memory_size", None)
+        if memory_size is not None:
+            size += memory_size()
+    return size
+
+
+class SessionManager:
+    """有界会话存储
+
+    会话分为两部分：
+    - 可共享的记录 (status、response_mode、created_at、last_seen等) 保存在
+      SessionStore中，使用共享后端时其他worker也能识别该会话
+    - 进程内状态 (例如SSE通道) 由local_factory创建，只存在于当前进程
+
+    get()返回的会话是合并了两部分的普通字典。本进程访问过的会话按最近使用
+    顺序缓存在OrderedDict中；修改可共享字段后需要调用save()写回存储。
+    访问存储的方法都是协程，存储的I/O不在事件循环中执行 (见SessionStore.run)。
+    """
+
+    def __init__(
+        self,
+        ttl: float = SESSION_TTL,
+        max_sessions: int = MAX_SESSIONS,
+        sweep_interval: float = SWEEP_INTERVAL,
+        store: Optional[SessionStore] = None,
+        local_factory: Optional[Callable[[], Dict[str, Any]]] = None
+    ):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.sweep_interval = sweep_interval
+        self.store = store if store is not None else create_store()
+        self.local_factory = local_factory or dict
+        # 最近使用时间写回存储的最小间隔，避免每个请求都写一次共享存储
+        self.touch_interval = 0.0 if isinstance(self.store, MemorySessionStore) else min(ttl / 10, 30.0)
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._local_keys: set = set()
+        self._listeners: List[Callable[[str, Dict[str, Any]], None]] = []
+        self._sweeper: Optional[asyncio.Task] = None
+        self.created = 0
+        self.evicted_idle = 0
+        self.evicted_lru = 0
+        self.closed = 0
+        # 存储中的会话数 (创建和清理时更新)，统计和指标读取它而不查询存储
+        self.active = 0
+
+    def __len__(self) -> int:
+        """存储中的会话数；阻塞的存储返回最近一次创建或清理时的计数"""
+        if isinstance(self.store, MemorySessionStore):
+            return len(self.store)
+        return self.active
+
+    def add_listener(self, callback: Callable[[str, Dict[str, Any]], None]) -> None:
+        """注册会话移除回调，会话过期、被淘汰或关闭时调用"""
+        self._listeners.append(callback)
+
+    def _materialize(self, session_id: str, record: Dict[str, Any]) -> Dict[str, Any]:
+        """根据存储记录创建本进程的会话对象"""
+        local = self.local_factory()
+        self._local_keys.update(local)
+        session = dict(record)
+        session.update(local)
+        session["persisted_at"] = record["last_seen"]
+        self._sessions[session_id] = session
+        return session
+
+    def _record(self, session: Dict[str, Any]) -> Dict[str, Any]:
+        """提取会话中可共享的字段"""
+        return {
+            k: v for k, v in session.items()
+            if k not in self._local_keys and k != "persisted_at"
+        }
+
+    async def create(self, **fields: Any) -> Tuple[str, Dict[str, Any]]:
+        """创建新会话，必要时淘汰最久未使用的会话"""
+        store = self.store
+        self.active = await store.run(store.__len__)
+        while self.active >= self.max_sessions:
+            oldest = await store.run(store.oldest)
+            if oldest is None:
+                break
+            self.evicted_lru += 1
+            logger.info(f"会话数达到上限，淘汰会话: ID={oldest}")
+            await self._discard(oldest)
+            self.active -= 1
+
+        now = time.time()
+        session_id = str(uuid.uuid4())
+        record = {"created_at": now, "last_seen": now}
+        record.update(fields)
+        await store.run(store.save, session_id, record)
+        self.active += 1
+        self.created += 1
+        return session_id, self._materialize(session_id, record)
+
+    async def save(self, session_id: str) -> None:
+        """将会话的可共享字段写回存储"""
+        session = self._sessions.get(session_id)
+        if session is not None:
+            await self.store.run(self.store.save, session_id, self._record(session))
+            session["persisted_at"] = session["last_seen"]
+
+    async def get(self, session_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        """获取会话并刷新其最近使用时间，已过期或不存在的会话返回None"""
+        if not session_id:
+            return None
+
+        store = self.store
+        session = self._sessions.get(session_id)
+        if session is None:
+            # 可能是其他worker创建的会话
+            record = await store.run(store.load, session_id)
+            if record is None:
+                return None
+            # 等待存储期间可能已有并发请求创建了本进程的会话对象
+            session = self._sessions.get(session_id) or self._materialize(session_id, record)
+
+        now = time.time()
+        if now - session["last_seen"] > self.ttl:
+            # 本地时间戳过期，确认其他worker是否使用过该会话
+            record = await store.run(store.load, session_id)
+            if record is None or now - record["last_seen"] > self.ttl:
+                self.evicted_idle += 1
+                await self._discard(session_id)
+                return None
+
+        session["last_seen"] = now
+        if session_id in self._sessions:
+            self._sessions.move_to_end(session_id)
+        if now - session["persisted_at"] > self.touch_interval:
+            session["persisted_at"] = now
+            if not await store.run(store.touch, session_id, now):
+                # 已被其他worker淘汰或关闭
+                session = self._sessions.pop(session_id, None)
+                if session is not None:
+                    self._notify(session_id, session)
+                return None
+        return session
+
+    def peek(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """获取本进程中的会话但不刷新其最近使用时间 (用于统计)"""
+        return self._sessions.get(session_id)
+
+    def local_sessions(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """本进程中的所有会话"""
+        return list(self._sessions.items())
+
+    async def remove(self, session_id: str) -> None:
+        """主动关闭会话"""
+        if session_id in self._sessions or await self.store.run(self.store.load, session_id) is not None:
+            self.closed += 1
+            await self._discard(session_id)
+
+    async def _discard(self, session_id: str) -> None:
+        """从存储和本进程缓存中删除会话"""
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._notify(session_id, session)
+        await self.store.run(self.store.delete, session_id)
+
+    async def sweep(self) -> int:
+        """清理所有空闲超时的会话，返回清理数量"""
+        store = self.store
+        deadline = time.time() - self.ttl
+        expired = await store.run(store.expired, deadline)
+        for session_id in expired:
+            self.evicted_idle += 1
+            await self._discard(session_id)
+
+        # 其他worker已删除的会话，只需释放本进程的状态
+        stale = []
+        for session_id, session in list(self._sessions.items()):
+            if session["last_seen"] < deadline and await store.run(store.load, session_id) is None:
+                stale.append(session_id)
+        for session_id in stale:
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                self._notify(session_id, session)
+
+        self.active = await store.run(store.__len__)
+        if expired or stale:
+            logger.info(f"清理空闲会话: 数量={len(expired) + len(stale)}, 剩余={len(self._sessions)}")
+        return len(expired)
+
+    def _notify(self, session_id: str, session: Dict[str, Any]) -> None:
+        for callback in self._listeners:
+            try:
+                callback(session_id, session)
+            except Exception as e:
+                logger.error(f"会话移除回调出错: {str(e)}", exc_info=True)
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"清理会话时出错: {str(e)}", exc_info=True)
+
+    def start(self) -> None:
+        """启动后台清理任务"""
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.get_running_loop().create_task(self._sweep_loop())
+
+    async def stop(self) -> None:
+        """停止后台清理任务并释放存储的线程池"""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+        self.store.shutdown()
+
+    def stats(self) -> Dict[str, Any]:
+        """会话统计信息 (created和evicted为本进程的计数)"""
+        return {
+            "active": len(self),
+            "local": len(self._sessions),
+            "created": self.created,
+            "evicted": self.evicted_idle + self.evicted_lru,
+            "evicted_idle": self.evicted_idle,
+            "evicted_lru": self.evicted_lru,
+            "closed": self.closed,
+            "memory_bytes": sum(session_memory(session) for session in self._sessions.values()),
+            "max_sessions": self.max_sessions,
+            "ttl_seconds": self.ttl,
+            "store": type(self.store).__name__
+        }
@@ -0,0 +1,278 @@
+"""
+会话存储后端
+会话的可共享部分 (状态、响应模式、时间戳) 保存在存储后端中，
+使用共享后端时多个uvicorn worker或多个dyno可以服务同一个会话
+
+会话还可以保存按键区分的附加数据 (例如累加器的状态)，通过modify_data()
+原子地读-改-写，会话删除时一并删除。
+
+存储的方法是同步的；会话管理器通过run()调用它们。进程内存储直接执行，
+SQLite存储在专用线程池中执行，等待数据库锁 (busy timeout) 时不阻塞事件循环。
+
+配置 (环境变量):
+- MCP_SESSION_STORE_THREADS: SQLite存储的线程数 (每个线程一个连接)，默认4
+"""
+from typing import Dict, Any, Optional, List, Callable, Tuple
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import os
+import copy
+import json
+import sqlite3
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+STORE_THREADS = int(os.environ.get("MCP_SESSION_STORE_THREADS", 4))
+
+
+class SessionStore:
+    """会话存储接口
+
+    记录是可JSON序列化的字典，至少包含created_at和last_seen (time.time()时间戳)。
+    """
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """执行存储的一个方法，例如 await store.run(store.load, session_id)"""
+        return func(*args)
+
+    def shutdown(self) -> None:
+        """释放存储占用的资源 (线程池、连接)"""
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """读取会话记录，不存在时返回None"""
+        raise NotImplementedError
+
+    def save(self, session_id: str, record: Dict[str, Any]) -> None:
+        """写入 (或覆盖) 会话记录"""
+        raise NotImplementedError
+
+    def touch(self, session_id: str, last_seen: float) -> bool:
+        """更新会话的最近使用时间，返回记录是否存在"""
+        raise NotImplementedError
+
+    def delete(self, session_id: str) -> bool:
+        """删除会话记录及其附加数据，返回记录是否存在"""
+        raise NotImplementedError
+
+    def load_data(self, session_id: str, key: str) -> Any:
+        """读取会话的附加数据 (可JSON序列化的值)，不存在时返回None"""
+        raise NotImplementedError
+
+    def modify_data(self, session_id: str, key: str, func: Callable[[Any], Tuple[Any, Any]]) -> Any:
+        """原子地修改会话的附加数据并返回func给出的结果
+
+        func接收当前值 (不存在时为None，可以原地修改) 并返回 (新值, 结果)，
+        新值为None时删除该数据；func抛出异常时不做任何修改。
+        会话不存在时抛出ValueError。
+        """
+        raise NotImplementedError
+
+    def expired(self, deadline: float) -> List[str]:
+        """返回最近使用时间早于deadline的会话ID"""
+        raise NotImplementedError
+
+    def oldest(self) -> Optional[str]:
+        """返回最久未使用的会话ID"""
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    """进程内会话存储，只适用于单个worker"""
+
+    def __init__(self):
+        self._records: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._data: Dict[str, Dict[str, Any]] = {}
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        record = self._records.get(session_id)
+        return dict(record) if record is not None else None
+
+    def save(self, session_id: str, record: Dict[str, Any]) -> None:
+        self._records[session_id] = dict(record)
+        self._records.move_to_end(session_id)
+
+    def touch(self, session_id: str, last_seen: float) -> bool:
+        record = self._records.get(session_id)
+        if record is None:
+            return False
+        record["last_seen"] = last_seen
+        self._records.move_to_end(session_id)
+        return True
+
+    def delete(self, session_id: str) -> bool:
+        self._data.pop(session_id, None)
+        return self._records.pop(session_id, None) is not None
+
+    def load_data(self, session_id: str, key: str) -> Any:
+        return self._data.get(session_id, {}).get(key)
+
+    def modify_data(self, session_id: str, key: str, func: Callable[[Any], Tuple[Any, Any]]) -> Any:
+        if session_id not in self._records:
+            raise ValueError(f"Unknown session: {session_id}")
+        data = self._data.setdefault(session_id, {})
+        # 浅拷贝：func原地修改后抛出异常时保存的值不受影响
+        value, result = func(copy.copy(data.get(key)))
+        if value is None:
+            data.pop(key, None)
+            if not data:
+                del self._data[session_id]
+        else:
+            data[key] = value
+        return result
+
+    def expired(self, deadline: float) -> List[str]:
+        return [sid for sid, record in self._records.items() if record["last_seen"] < deadline]
+
+    def oldest(self) -> Optional[str]:
+        return next(iter(self._records), None)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+
+class SQLiteSessionStore(SessionStore):
+    """基于SQLite文件的会话存储
+
+    同一台机器上的多个worker共享同一个数据库文件 (WAL模式)。
+    通过run()调用时在专用线程池中执行，每个线程使用自己的连接 (WAL模式下
+    读取可以并发进行，写入等待数据库锁时只占用该线程)；fork后自动重新连接。
+    """
+
+    def __init__(self, path: str, threads: int = STORE_THREADS):
+        self.path = path
+        self.threads = threads
+        self._local = threading.local()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_pid: Optional[int] = None
+
+    @property
+    def pool(self) -> ThreadPoolExecutor:
+        if self._pool is None or self._pool_pid != os.getpid():
+            self._pool = ThreadPoolExecutor(self.threads, thread_name_prefix="mcp-session-store")
+            self._pool_pid = os.getpid()
+        return self._pool
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self.pool, func, *args)
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "id TEXT PRIMARY KEY, data TEXT NOT NULL, created_at REAL NOT NULL, last_seen REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS session_data ("
+                "session_id TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, PRIMARY KEY (session_id, key))"
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            logger.info(f"已连接SQLite会话存储: {self.path}")
+        return conn
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        return self._connection().execute(sql, params)
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        row = self._execute(
+            "SELECT data, created_at, last_seen FROM sessions WHERE id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        record = json.loads(row[0])
+        record["created_at"] = row[1]
+        record["last_seen"] = row[2]
+        return record
+
+    def save(self, session_id: str, record: Dict[str, Any]) -> None:
+        data = {k: v for k, v in record.items() if k not in ("created_at", "last_seen")}
+        self._execute(
+            "INSERT OR REPLACE INTO sessions (id, data, created_at, last_seen) VALUES (?, ?, ?, ?)",
+            (session_id, json.dumps(data), record["created_at"], record["last_seen"])
+        )
+
+    def touch(self, session_id: str, last_seen: float) -> bool:
+        return self._execute(
+            "UPDATE sessions SET last_seen = MAX(last_seen, ?) WHERE id = ?", (last_seen, session_id)
+        ).rowcount > 0
+
+    def delete(self, session_id: str) -> bool:
+        # 先删除会话记录，之后的modify_data会因为会话不存在而失败，不会留下孤立的数据
+        deleted = self._execute("DELETE FROM sessions WHERE id = ?", (session_id,)).rowcount > 0
+        self._execute("DELETE FROM session_data WHERE session_id = ?", (session_id,))
+        return deleted
+
+    def load_data(self, session_id: str, key: str) -> Any:
+        row = self._execute(
+            "SELECT value FROM session_data WHERE session_id = ? AND key = ?", (session_id, key)
+        ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def modify_data(self, session_id: str, key: str, func: Callable[[Any], Tuple[Any, Any]]) -> Any:
+        conn = self._connection()
+        # BEGIN IMMEDIATE立即获取写锁，多个worker对同一数据的读-改-写依次执行
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM sessions WHERE id = ?", (session_id,)).fetchone() is None:
+                raise ValueError(f"Unknown session: {session_id}")
+            row = conn.execute(
+                "SELECT value FROM session_data WHERE session_id = ? AND key = ?", (session_id, key)
+            ).fetchone()
+            value, result = func(json.loads(row[0]) if row is not None else None)
+            if value is None:
+                conn.execute("DELETE FROM session_data WHERE session_id = ? AND key = ?", (session_id, key))
+            else:
+                conn.execute(
+                    "INSERT OR REPLACE INTO session_data (session_id, key, value) VALUES (?, ?, ?)",
+                    (session_id, key, json.dumps(value))
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def expired(self, deadline: float) -> List[str]:
+        rows = self._execute("SELECT id FROM sessions WHERE last_seen < ?", (deadline,)).fetchall()
+        return [row[0] for row in rows]
+
+    def oldest(self) -> Optional[str]:
+        row = self._execute("SELECT id FROM sessions ORDER BY last_seen LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def __len__(self) -> int:
+        return self._execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+def create_store(url: Optional[str] = None) -> SessionStore:
+    """根据配置创建会话存储
+
+    url为空或"memory"时使用进程内存储，"sqlite:///sessions.db" (相对路径)、
+    "sqlite:////tmp/sessions.db" (绝对路径) 或直接给出.db文件路径时使用SQLite文件存储。
+    默认读取环境变量MCP_SESSION_STORE。
+    """
+    url = url if url is not None else os.environ.get("MCP_SESSION_STORE", "memory")
+    if not url or url == "memory":
+        return MemorySessionStore()
+    if url.startswith("sqlite:///"):
+        # sqlite:///relative.db 或 sqlite:////absolute/path.db
+        return SQLiteSessionStore(url[len("sqlite:///"):])
+    if url.endswith(".db") or url.endswith(".sqlite"):
+        return SQLiteSessionStore(url)
+    raise ValueError(f"不支持的会话存储: {url}")
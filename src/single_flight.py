@@ -0,0 +1,97 @@
+"""
+相同工具调用的合并执行 (single-flight)
+多个会话同时发出相同的工具调用 (同一工具、规范化后相同的参数) 时，
+分发器只执行一次，其余调用等待同一个结果。与结果缓存不同，合并只发生在
+调用仍在执行期间，执行结束后的调用会重新执行。
+
+只有标记了@coalesce的工具才会合并。合并键是规范化编码的全部参数，在事件循环中
+计算；参数很大时 (例如上百万个数的数组) 编码的开销远超执行本身，因此可以用
+@coalesce(when=...) 只合并较小的调用，与@memoized(when=...) 使用同一个条件。合并的工具必须与会话无关且没有副作用
+(例如查询用户信息)；按会话保存状态或每次调用都有效果的工具 (如累加器)
+不能标记。工具在单独的任务中执行，发起调用的请求被取消时，等待同一结果
+的其他请求不受影响。
+
+配置 (环境变量):
+- MCP_SINGLE_FLIGHT: 设为off时禁用合并
+"""
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+import os
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.environ.get("MCP_SINGLE_FLIGHT", "on").lower() not in ("off", "0", "false")
+
+
+def coalesce(
+    func: Optional[Callable[..., Any]] = None,
+    when: Optional[Callable[..., bool]] = None
+) -> Any:
+    """标记工具可以合并相同的并发调用，放在mcp.tool()下面
+
+    可以直接使用@coalesce，或用@coalesce(when=条件) 只合并条件为真的调用；
+    条件以工具的原始参数 (未经校验的JSON值) 作为关键字参数调用。
+    """
+    def mark(func: Callable[..., Any]) -> Callable[..., Any]:
+        func._coalesce = True
+        func._coalesce_when = when
+        return func
+    return mark(func) if func is not None else mark
+
+
+def is_coalesced(func: Callable[..., Any]) -> bool:
+    return ENABLED and getattr(func, "_coalesce", False)
+
+
+def should_coalesce(func: Callable[..., Any], arguments: Dict[str, Any]) -> bool:
+    """这次调用是否合并：没有条件时总是合并，参数不符合条件的签名时不合并 (由工具自己报告参数错误)"""
+    when = getattr(func, "_coalesce_when", None)
+    if when is None:
+        return True
+    try:
+        return bool(when(**arguments))
+    except Exception:
+        return False
+
+
+class SingleFlight:
+    """按键合并并发执行的协程"""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.executions = 0
+        self.shared = 0
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    def _done(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # 所有等待者都已取消时，避免"Task exception was never retrieved"警告
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """执行func，键相同的调用正在执行时等待它的结果"""
+        task = self._calls.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._done(key, done))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": ENABLED,
+            "in_flight": len(self._calls),
+            "executions": self.executions,
+            "shared": self.shared
+        }
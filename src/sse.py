@@ -0,0 +1,294 @@
+"""
+会话SSE通道
+每个POST请求的结果通过各自的短流返回，发送完即关闭。每个会话最多有一个
+长连接SSE消费者 (通过 GET /mcp 连接)，用于重放错过的事件并保持连接。
+
+会话内的所有SSE事件都带有单调递增的事件ID，并保存在有界的重放缓冲区中
+(同时限制事件数和字节数，超出时先淘汰最早的事件)。
+连接断开后客户端携带Last-Event-ID重新连接长连接通道，即可收到错过的事件。
+事件ID和重放缓冲区只存在于当前进程中，因此恢复只在同一个worker内有效：
+每个通道的事件ID从随机的起点开始，不是本通道发出的Last-Event-ID会被拒绝，
+而不是从另一个worker的计数中重放错误的事件。
+
+需要等待的短流 (流式批量请求、分块读取的文件和目录树) 使用EventStream响应：
+等待下一个事件期间同样发送心跳，客户端断开时立即停止生成事件。
+
+服务器目前没有主动推送的消息，所有事件都由请求的短流按需生成 (消费者读取
+时才产生下一个事件)，因此长连接通道没有待发送队列，也不需要溢出策略。
+"""
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Tuple, Union
+from collections import deque
+import os
+import sys
+import random
+import asyncio
+import logging
+
+from starlette.requests import ClientDisconnect
+from starlette.responses import StreamingResponse
+
+from .serializer import encode_sse
+from . import metrics, tracing
+
+logger = logging.getLogger(__name__)
+
+# 每个会话重放缓冲区保留的最近事件数
+REPLAY_EVENTS = int(os.environ.get("MCP_SSE_REPLAY_EVENTS", 100))
+# 每个会话重放缓冲区最多占用的字节数，单个事件超过此大小时不进入缓冲区
+REPLAY_BYTES = int(os.environ.get("MCP_SSE_REPLAY_BYTES", 4 * 1024 * 1024))
+# 心跳间隔 (秒)，需要小于代理的空闲超时 (Heroku为55秒)，0表示不发送心跳
+HEARTBEAT_INTERVAL = float(os.environ.get("MCP_SSE_HEARTBEAT_INTERVAL", 15))
+# 长连接没有任何事件超过此时间 (秒) 后关闭，0表示不限制
+IDLE_TIMEOUT = float(os.environ.get("MCP_SSE_IDLE_TIMEOUT", 600))
+
+# 心跳事件：SSE注释行，客户端会忽略
+HEARTBEAT = b": keepalive\n\n"
+
+
+def format_as_sse(data: Union[dict, list], event_id: Optional[int] = None) -> List[bytes]:
+    """将数据格式化为SSE事件 (已编码的字节，可直接写入响应)"""
+    try:
+        # 确保使用正确的SSE格式：id: 事件ID，data: 后面是数据，以\n\n结尾
+        return [encode_sse(data, event_id)]
+    except Exception as e:
+        logger.error(f"格式化SSE事件时出错: {str(e)}")
+        return [encode_sse({"error": f"格式化SSE事件时出错: {str(e)}"}, event_id)]
+
+
+def parse_last_event_id(value: Optional[str]) -> Optional[int]:
+    """解析Last-Event-ID请求头，无效时返回None"""
+    if not value:
+        return None
+    try:
+        return int(value.strip())
+    except ValueError:
+        return None
+
+
+class SessionChannel:
+    """会话的长连接SSE通道
+
+    新的消费者连接时会替换旧的消费者，旧消费者的生成器随即结束；
+    关闭通道 (会话过期或被淘汰) 时当前消费者的生成器也会结束。
+    """
+
+    def __init__(
+        self,
+        replay_events: int = REPLAY_EVENTS,
+        replay_bytes: int = REPLAY_BYTES,
+        heartbeat_interval: float = HEARTBEAT_INTERVAL,
+        idle_timeout: float = IDLE_TIMEOUT
+    ):
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        self.closed = False
+        # 事件ID的随机起点 (不超过JavaScript的安全整数范围)，使其他进程发出的ID不会与本通道重叠
+        self.first_event_id = random.getrandbits(40)
+        self.last_event_id = self.first_event_id
+        self.replay: Deque[Tuple[int, bytes]] = deque()
+        self.replay_events = replay_events
+        self.replay_bytes_limit = replay_bytes
+        self.replay_bytes = 0
+        self._stop: Optional[asyncio.Future] = None
+
+    @property
+    def attached(self) -> bool:
+        """是否有消费者正在连接"""
+        return self._stop is not None and not self._stop.done()
+
+    def issued(self, event_id: int) -> bool:
+        """事件ID是否由本通道发出"""
+        return self.first_event_id < event_id <= self.last_event_id
+
+    def record(self, data: Any) -> List[bytes]:
+        """为数据分配下一个事件ID，编码后保存到重放缓冲区"""
+        self.last_event_id += 1
+        event_id = self.last_event_id
+        with tracing.span("serialize"):
+            items = format_as_sse(data, event_id)
+        for item in items:
+            self._remember(event_id, item)
+        return items
+
+    def record_bytes(self, payload: bytes) -> bytes:
+        """与record相同，但数据已经是编码好的JSON字节"""
+        self.last_event_id += 1
+        item = b"id: %d\ndata: " % self.last_event_id + payload + b"\n\n"
+        self._remember(self.last_event_id, item)
+        return item
+
+    def _remember(self, event_id: int, item: bytes) -> None:
+        """将事件保存到重放缓冲区，超出事件数或字节预算时先淘汰最早的事件
+
+        超过整个字节预算的事件不保存 (事件ID照常分配)，重新连接时无法重放。
+        """
+        size = len(item)
+        if size > self.replay_bytes_limit or self.replay_events <= 0:
+            logger.debug(f"SSE事件 {event_id} 大小 {size} 字节，超过重放缓冲区预算，不保存")
+            return
+        while self.replay and (
+            len(self.replay) >= self.replay_events
+            or self.replay_bytes + size > self.replay_bytes_limit
+        ):
+            _, evicted = self.replay.popleft()
+            self.replay_bytes -= len(evicted)
+        self.replay.append((event_id, item))
+        self.replay_bytes += size
+
+    def _detach(self) -> None:
+        if self._stop is not None and not self._stop.done():
+            self._stop.set_result(None)
+        self._stop = None
+
+    def close(self) -> None:
+        """关闭通道，结束当前消费者"""
+        self.closed = True
+        self._detach()
+
+    async def stream(
+        self,
+        session_id: str = "",
+        last_event_id: Optional[int] = None,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None
+    ) -> AsyncIterator[bytes]:
+        """长连接消费者生成器，被替换、通道关闭、客户端断开或空闲超时时结束
+
+        给出last_event_id时先重放缓冲区中更新的事件。
+        之后每隔heartbeat_interval秒发送一个SSE注释作为心跳，并通过
+        is_disconnected检查客户端是否已经断开。
+        """
+        self._detach()
+        loop = asyncio.get_running_loop()
+        stop = loop.create_future()
+        self._stop = stop
+        last_activity = loop.time()
+        logger.info(f"会话 {session_id} 的SSE通道已连接")
+
+        try:
+            if last_event_id is not None:
+                if self.replay and self.replay[0][0] > last_event_id + 1:
+                    logger.warning(
+                        f"会话 {session_id} 的重放缓冲区已不包含事件 {last_event_id + 1}-{self.replay[0][0] - 1}"
+                    )
+                replayed = [item for event_id, item in self.replay if event_id > last_event_id]
+                logger.info(f"会话 {session_id} 的SSE通道恢复: Last-Event-ID={last_event_id}, 重放={len(replayed)}")
+                for item in replayed:
+                    last_activity = loop.time()
+                    metrics.SSE_EVENTS.inc("replay")
+                    metrics.SSE_BYTES.inc("replay", amount=len(item))
+                    yield item
+
+            while not self.closed and not stop.done():
+                await asyncio.wait({stop}, timeout=self.heartbeat_interval or None)
+                if stop.done():
+                    break
+
+                # 空闲超时：检查客户端连接，回收长时间空闲的连接，否则发送心跳
+                if is_disconnected is not None and await is_disconnected():
+                    logger.info(f"会话 {session_id} 的SSE客户端已断开")
+                    break
+                if self.idle_timeout and loop.time() - last_activity > self.idle_timeout:
+                    logger.info(f"会话 {session_id} 的SSE通道空闲超过 {self.idle_timeout} 秒，关闭连接")
+                    break
+                yield HEARTBEAT
+        finally:
+            if self._stop is stop:
+                self._stop = None
+            logger.info(f"会话 {session_id} 的SSE通道已断开")
+
+    def stats(self) -> Dict[str, Any]:
+        """通道的连接和重放缓冲区统计信息"""
+        return {
+            "attached": self.attached,
+            "last_event_id": self.last_event_id,
+            "replay_events": len(self.replay),
+            "replay_bytes": self.replay_bytes
+        }
+
+    def memory_size(self) -> int:
+        """重放缓冲区占用的字节数"""
+        return sum(sys.getsizeof(item) for _, item in self.replay)
+
+
+async def stream_items(items: Iterable[bytes]) -> AsyncIterator[bytes]:
+    """单个请求的短流：发送给定的事件后结束"""
+    for item in items:
+        metrics.SSE_EVENTS.inc("response")
+        metrics.SSE_BYTES.inc("response", amount=len(item))
+        yield item
+
+
+async def with_heartbeats(
+    source: AsyncIterator[bytes],
+    disconnected: asyncio.Event,
+    heartbeat_interval: float = HEARTBEAT_INTERVAL
+) -> AsyncIterator[bytes]:
+    """包装短流生成器：等待下一个事件超过heartbeat_interval秒时发送心跳，客户端断开时停止
+
+    停止时取消正在等待的下一个事件并关闭源生成器，源生成器的finally
+    (例如取消尚未完成的目录扫描) 会立即执行。
+    """
+    pending: Optional[asyncio.Future] = None
+    waiter = asyncio.ensure_future(disconnected.wait())
+    try:
+        while not disconnected.is_set():
+            if pending is None:
+                pending = asyncio.ensure_future(source.__anext__())
+            await asyncio.wait(
+                {pending, waiter},
+                timeout=heartbeat_interval or None,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            if pending.done():
+                try:
+                    item = pending.result()
+                except StopAsyncIteration:
+                    pending = None
+                    return
+                pending = None
+                yield item
+            elif not disconnected.is_set():
+                yield HEARTBEAT
+        logger.info("SSE短流的客户端已断开，停止生成事件")
+    finally:
+        waiter.cancel()
+        if pending is not None and not pending.done():
+            pending.cancel()
+            try:
+                await pending
+            except BaseException:
+                pass
+        await source.aclose()
+
+
+class EventStream(StreamingResponse):
+    """需要等待的单个请求SSE短流
+
+    与StreamingResponse不同，无论ASGI服务器的版本如何都会监听客户端断开，
+    并在等待下一个事件期间发送心跳，避免代理因空闲关闭连接。
+    """
+
+    def __init__(self, content: AsyncIterator[bytes], heartbeat_interval: float = HEARTBEAT_INTERVAL, **kwargs: Any):
+        super().__init__(content, media_type="text/event-stream", **kwargs)
+        self.heartbeat_interval = heartbeat_interval
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        disconnected = asyncio.Event()
+
+        async def listen_for_disconnect() -> None:
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    disconnected.set()
+                    return
+
+        listener = asyncio.ensure_future(listen_for_disconnect())
+        self.body_iterator = with_heartbeats(self.body_iterator, disconnected, self.heartbeat_interval)
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        finally:
+            listener.cancel()
+        if self.background is not None:
+            await self.background()
@@ -0,0 +1,154 @@
+"""
+数值统计引擎
+计算工具使用的统计函数。输入已经是NumPy数组 (base64编码数组) 时使用向量化计算；
+JSON列表求和与平均值直接使用内置sum，因为把列表转换成数组的开销大于求和本身。
+需要排序的describe() (以及累加器) 对较长的列表也转换为数组，排序的收益大于转换开销；
+否则使用单次遍历的纯Python循环同时得到总和、最小值、最大值和方差。
+
+配置 (环境变量):
+- MCP_STATS_BACKEND: numpy (默认，NumPy可用时) 或 python
+- MCP_STATS_NUMPY_MIN_SIZE: describe()把列表转换为数组的最小长度，更短的列表用纯Python更快
+"""
+from typing import Any, Dict, Iterable, Sequence, Tuple
+import os
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+BACKEND = "numpy" if np is not None and os.environ.get("MCP_STATS_BACKEND", "numpy") == "numpy" else "python"
+NUMPY_MIN_SIZE = int(os.environ.get("MCP_STATS_NUMPY_MIN_SIZE", 1000))
+
+
+def is_array(values: Any) -> bool:
+    """输入是否已经是NumPy数组 (不需要转换)"""
+    return BACKEND == "numpy" and isinstance(values, np.ndarray)
+
+
+def use_numpy(values: Any) -> bool:
+    """需要排序的计算是否使用NumPy：NumPy数组总是使用，列表达到NUMPY_MIN_SIZE时使用"""
+    if BACKEND != "numpy":
+        return False
+    return isinstance(values, np.ndarray) or len(values) >= NUMPY_MIN_SIZE
+
+
+def as_array(values: Any) -> Any:
+    """转换为float64的NumPy数组，已经是数组时不复制"""
+    return np.asarray(values, dtype=np.float64)
+
+
+def percentile_key(p: float) -> str:
+    """百分位数的结果键，例如 p90、p99.9"""
+    return f"p{p:g}"
+
+
+def check_percentiles(percentiles: Iterable[float]) -> Tuple[float, ...]:
+    """检查百分位数都在0到100之间"""
+    checked = tuple(float(p) for p in percentiles)
+    for p in checked:
+        if not 0.0 <= p <= 100.0:
+            raise ValueError(f"Percentile must be between 0 and 100: {p:g}")
+    return checked
+
+
+def total(values: Sequence[float]) -> float:
+    """总和，列表直接使用内置sum"""
+    if is_array(values):
+        return float(np.sum(as_array(values)))
+    return float(sum(values))
+
+
+def mean(values: Sequence[float]) -> float:
+    """平均值"""
+    if len(values) == 0:
+        raise ValueError("Numbers list cannot be empty")
+    return total(values) / len(values)
+
+
+def moments(values: Sequence[float]) -> Tuple[int, float, float, float, float]:
+    """单次遍历同时计算 (数量, 总和, 最小值, 最大值, 离差平方和)
+
+    以第一个值为偏移量累加偏移后的和与平方和，避免数值接近时平方和相减的精度损失。
+    """
+    shift = values[0]
+    low = high = shift
+    shifted_sum = 0.0
+    shifted_squares = 0.0
+    for x in values:
+        d = x - shift
+        shifted_sum += d
+        shifted_squares += d * d
+        if x < low:
+            low = x
+        elif x > high:
+            high = x
+    n = len(values)
+    squares = max(shifted_squares - shifted_sum * shifted_sum / n, 0.0)
+    return n, shift * n + shifted_sum, low, high, squares
+
+
+def interpolate(ordered: Sequence[float], p: float) -> float:
+    """已排序序列的百分位数，线性插值 (与numpy.percentile默认方法一致)"""
+    rank = p / 100.0 * (len(ordered) - 1)
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def describe(values: Sequence[float], percentiles: Iterable[float] = ()) -> Dict[str, Any]:
+    """计算总和、平均值、最小值、最大值、数量、方差、标准差、中位数和指定的百分位数
+
+    方差和标准差是总体方差 (除以n)。
+    """
+    if len(values) == 0:
+        raise ValueError("Numbers list cannot be empty")
+    percentiles = check_percentiles(percentiles)
+    if use_numpy(values):
+        return _describe_numpy(as_array(values), percentiles)
+    return _describe_python(values, percentiles)
+
+
+def _describe_numpy(data: Any, percentiles: Tuple[float, ...]) -> Dict[str, Any]:
+    count = int(data.size)
+    data_sum = float(np.sum(data))
+    average = data_sum / count
+    deviations = data - average
+    variance = float(np.dot(deviations, deviations)) / count
+    # 中位数和百分位数一起计算，只做一次部分排序
+    quantiles = np.percentile(data, (50.0,) + percentiles)
+    result = {
+        "sum": data_sum,
+        "average": average,
+        "min": float(np.min(data)),
+        "max": float(np.max(data)),
+        "count": count,
+        "variance": variance,
+        "stddev": math.sqrt(variance),
+        "median": float(quantiles[0])
+    }
+    if percentiles:
+        result["percentiles"] = {
+            percentile_key(p): float(q) for p, q in zip(percentiles, quantiles[1:])
+        }
+    return result
+
+
+def _describe_python(values: Sequence[float], percentiles: Tuple[float, ...]) -> Dict[str, Any]:
+    count, data_sum, low, high, squares = moments(values)
+    variance = squares / count
+    ordered = sorted(values)
+    result = {
+        "sum": float(data_sum),
+        "average": float(data_sum / count),
+        "min": float(low),
+        "max": float(high),
+        "count": count,
+        "variance": float(variance),
+        "stddev": math.sqrt(variance),
+        "median": float(interpolate(ordered, 50.0))
+    }
+    if percentiles:
+        result["percentiles"] = {percentile_key(p): float(interpolate(ordered, p)) for p in percentiles}
+    return result
@@ -2,77 +2,164 @@
 StreamableHTTP MCP服务器
 提供基于HTTP的流式通信功能，支持JSON响应模式
 """
-from typing import Dict, Optional, Any, List, Union
-import json
-import uuid
+from typing import Dict, Optional, Any, List, Union, Mapping
+import time
 import logging
-import asyncio
-from fastapi import FastAPI, Request, Response, BackgroundTasks
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response
 from fastapi.responses import JSONResponse, StreamingResponse, HTMLResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
 
 # 导入MCP服务器实例
 try:
     from src.mcp_server import mcp
     from src.resources import filesystem
-    from src.tools import calculator, user
+    from src.tools import calculator, accumulator, user, health
     from src.prompts import code_review, git_helper, api_design
+    from src.dispatcher import Dispatcher, make_result, make_error, INTERNAL_ERROR
+    from src.batch import execute_batch, iter_batch, is_notification
+    from src.catalog import list_kind, etag_matches
+    from src.session_manager import SessionManager
+    from src.serializer import FastJSONResponse, loads, encode_sse
+    from src.asgi_fast_path import MCPFastPath
+    from src.sse import SessionChannel, EventStream, stream_items, parse_last_event_id
+    from src.request_log import RequestLog, setup_logging, stop_logging
+    from src import metrics, tracing, memoize
+    from src.accumulators import accumulators
+    from src.scheduler import scheduler
+    from src.file_reader import split_query, resolve_path, iter_chunks
+    from src.file_io import file_io
+    from src.file_cache import file_cache
+    from src import tree_walk
 except ImportError:
     # 如果上面的导入失败，尝试相对导入(本地开发环境)
     from .mcp_server import mcp
     from .resources import filesystem
-    from .tools import calculator, user
+    from .tools import calculator, accumulator, user, health
     from .prompts import code_review, git_helper, api_design
+    from .dispatcher import Dispatcher, make_result, make_error, INTERNAL_ERROR
+    from .batch import execute_batch, iter_batch, is_notification
+    from .catalog import list_kind, etag_matches
+    from .session_manager import SessionManager
+    from .serializer import FastJSONResponse, loads, encode_sse
+    from .asgi_fast_path import MCPFastPath
+    from .sse import SessionChannel, EventStream, stream_items, parse_last_event_id
+    from .request_log import RequestLog, setup_logging, stop_logging
+    from . import metrics, tracing, memoize
+    from .accumulators import accumulators
+    from .scheduler import scheduler
+    from .file_reader import split_query, resolve_path, iter_chunks
+    from .file_io import file_io
+    from .file_cache import file_cache
+    from . import tree_walk
 
-# 日志配置
-logging.basicConfig(level=logging.INFO)
+# 请求日志按路由采样 (见src/request_log.py)
 logger = logging.getLogger(__name__)
+request_log = RequestLog(logger)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：配置日志，启动和停止会话清理任务，关闭工具执行池"""
+    # 日志由后台线程输出；导入mcp时FastMCP已经给根日志记录器添加了处理器，
+    # 这里在服务器启动时替换掉，而不是在导入模块时修改全局日志配置
+    setup_logging(force=True)
+    sessions.start()
+    yield
+    await sessions.stop()
+    scheduler.shutdown()
+    file_io.shutdown()
+    stop_logging()
 
 # 创建FastAPI应用
-app = FastAPI(title="MCP StreamableHTTP Server")
+app = FastAPI(title="MCP StreamableHTTP Server", lifespan=lifespan)
+
+# CORS配置 (FastAPI应用和ASGI快速路径共用)
+CORS_OPTIONS = {
+    "allow_origins": ["*"],  # 允许所有源
+    "allow_credentials": True,
+    "allow_methods": ["*"],  # 允许所有方法
+    "allow_headers": ["*"],  # 允许所有头部
+}
 
 # 添加CORS中间件
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # 允许所有源
-    allow_credentials=True,
-    allow_methods=["*"],  # 允许所有方法
-    allow_headers=["*"],  # 允许所有头部
-)
+app.add_middleware(CORSMiddleware, **CORS_OPTIONS)
 
-# 会话存储
-sessions: Dict[str, Dict[str, Any]] = {}
+# 会话存储 (空闲超时和最大会话数淘汰)
+# 会话记录保存在MCP_SESSION_STORE指定的后端中，SSE通道只存在于当前进程
+sessions = SessionManager(local_factory=lambda: {"channel": SessionChannel()})
+# 会话移除时关闭其SSE通道，结束仍在等待的长连接
+sessions.add_listener(lambda session_id, session: session["channel"].close())
+# 增量统计累加器的状态保存在会话存储中，随会话一起删除
+accumulators.bind(sessions.store)
 
-class MCPRequest(BaseModel):
-    jsonrpc: str
-    method: str
-    params: Optional[Dict[str, Any]] = None
-    id: Optional[str] = None
+# 请求分发表 (所有模块导入完成后根据注册表构建一次)
+dispatcher = Dispatcher(mcp)
+
+# 抓取 /metrics 时计算的会话和SSE通道指标
+metrics.REGISTRY.callback("mcp_sessions_active", "存储中的活跃会话数", lambda: len(sessions))
+metrics.REGISTRY.callback("mcp_sessions_local", "本进程中的会话数", lambda: len(sessions.local_sessions()))
+metrics.REGISTRY.callback(
+    "mcp_sessions_evicted_total", "本进程淘汰的会话数",
+    lambda: {("idle",): sessions.evicted_idle, ("lru",): sessions.evicted_lru},
+    ("reason",), type="counter"
+)
+metrics.REGISTRY.callback(
+    "mcp_sse_channels", "SSE通道汇总 (已连接的长连接消费者、重放缓冲区中的事件数和字节数)",
+    lambda: {(key,): value for key, value in sse_stats().items()},
+    ("stat",)
+)
+metrics.REGISTRY.callback(
+    "mcp_tool_calls_in_flight", "正在执行的可合并工具调用数", lambda: len(dispatcher.flights)
+)
+metrics.REGISTRY.callback(
+    "mcp_file_cache_lookups_total", "文件内容缓存查找次数",
+    lambda: {("hit",): file_cache.hits, ("miss",): file_cache.misses},
+    ("result",), type="counter"
+)
+metrics.REGISTRY.callback("mcp_file_cache_bytes", "文件内容缓存占用的字节数", lambda: file_cache.bytes)
+metrics.REGISTRY.callback(
+    "mcp_memo_lookups_total", "工具结果缓存查找次数",
+    lambda: {
+        (name, result): count
+        for name, cache in memoize.caches.items()
+        for result, count in (("hit", cache.hits), ("miss", cache.misses))
+    },
+    ("function", "result"), type="counter"
+)
+metrics.REGISTRY.callback(
+    "mcp_memo_bytes", "工具结果缓存占用的字节数",
+    lambda: {(name,): cache.bytes for name, cache in memoize.caches.items()},
+    ("function",)
+)
 
 @app.post("/mcp")
-async def handle_mcp_request(request: Request, background_tasks: BackgroundTasks):
+async def handle_mcp_request(request: Request):
     """
     处理MCP请求
     支持初始化请求和普通请求，支持JSON响应和流式响应
     """
+    return await handle_mcp_message(await request.body(), request.headers)
+
+@metrics.timed_http
+@tracing.traced
+async def handle_mcp_message(raw_body: bytes, headers: Mapping[str, str]) -> Response:
+    """
+    处理一个MCP POST请求的请求体，返回ASGI响应
+    FastAPI路由和ASGI快速路径 (src/asgi_fast_path.py) 共用此函数
+    请求头带有 x-mcp-trace: 1 时记录各阶段耗时 (src/tracing.py)
+    """
     try:
-        # 记录请求头以便调试
-        headers = dict(request.headers.items())
-        user_agent = headers.get('user-agent', '未知')
-        content_type = headers.get('content-type', '未知')
-        accept = headers.get('accept', '未知')
-        logger.info(f"收到请求: UA={user_agent}, CT={content_type}, Accept={accept}")
-        
         # 获取会话ID和请求体
-        session_id = request.headers.get("mcp-session-id")
+        session_id = headers.get("mcp-session-id")
+        session = await sessions.get(session_id)
         
         try:
-            body = await request.json()
-            logger.info(f"收到MCP请求: 会话ID={session_id}, 方法={get_method_from_body(body)}")
+            with tracing.span("parse"):
+                body = loads(raw_body)
         except Exception as e:
             logger.error(f"解析请求体时出错: {str(e)}")
-            return JSONResponse(
+            metrics.RPC_ERRORS.inc("unknown", "-32700")
+            return FastJSONResponse(
                 status_code=400,
                 content={
                     "jsonrpc": "2.0",
@@ -85,71 +172,102 @@ async def handle_mcp_request(request: Request, background_tasks: BackgroundTasks
                 headers={"Content-Type": "application/json"}
             )
         
+        # 本请求的日志记录器 (按方法名采样)，字段在后台日志线程中才格式化
+        log = request_log.route(get_route(body))
+        tracing.tag(route=log.route, session_id=session_id)
+        # 记录请求头以便调试
+        log.debug(
+            "收到请求",
+            ua=headers.get("user-agent"), content_type=headers.get("content-type"), accept=headers.get("accept")
+        )
+        
         # 检查是否是初始化请求
         if not session_id and is_initialize_request(body):
             # 新会话初始化
-            session_id = str(uuid.uuid4())
-            sessions[session_id] = {
-                "status": "initializing",
-                "queue": asyncio.Queue(),
-                "response_mode": get_response_mode(request),
-            }
+            session_id, session = await sessions.create(
+                status="initializing",
+                response_mode=get_response_mode(headers.get("accept", "")),
+            )
             
-            logger.info(f"新会话初始化: ID={session_id}, 响应模式={sessions[session_id]['response_mode']}")
+            log.info("新会话初始化", session_id=session_id, response_mode=session["response_mode"])
             
             # 处理初始化请求
+            start = time.perf_counter()
             result = await process_initialize_request(body, session_id)
-            sessions[session_id]["status"] = "active"
+            metrics.observe_rpc("initialize", time.perf_counter() - start, result)
+            session["status"] = "active"
+            await sessions.save(session_id)
             
             # 根据请求的Accept头决定返回JSON响应还是流式响应
-            if sessions[session_id]["response_mode"] == "json":
-                logger.info(f"使用JSON响应模式，会话ID={session_id}")
-                return JSONResponse(
+            if session["response_mode"] == "json":
+                return FastJSONResponse(
                     content=result,
                     headers={"mcp-session-id": session_id, "Content-Type": "application/json"}
                 )
             else:
-                logger.info(f"使用流式响应模式，会话ID={session_id}")
-                # 将结果放入队列，并设置后台任务来处理未来的响应
-                for item in format_as_sse(result):
-                    await sessions[session_id]["queue"].put(item)
-                
-                # 启动后台流处理
-                background_tasks.add_task(process_mcp_queue, session_id)
-                
+                # 初始化结果通过短流返回，服务器推送的消息通过 GET /mcp 长连接接收
                 return StreamingResponse(
-                    stream_response(session_id),
+                    stream_items(session["channel"].record(result)),
                     media_type="text/event-stream",
                     headers={"mcp-session-id": session_id}
                 )
         
         # 处理已有会话的请求
-        elif session_id and session_id in sessions:
+        elif session is not None:
             # 处理常规请求
-            logger.info(f"处理会话请求: ID={session_id}, 方法={get_method_from_body(body)}")
+            log.info("处理会话请求", session_id=session_id, response_mode=session["response_mode"])
+            
+            # 目录列表请求直接返回预先序列化的缓存内容
+            kind = list_kind(body)
+            if kind is not None:
+                start = time.perf_counter()
+                response = catalog_response(headers.get("if-none-match"), kind, body.get("id", "1"), session)
+                metrics.observe_rpc(body["method"], time.perf_counter() - start, None)
+                return response
+            
+            # 流式会话的批量请求：每个请求完成后立即作为一个SSE事件发送
+            # 以下短流等待期间发送心跳，客户端断开时停止执行 (见src/sse.py的EventStream)
+            # 全部是通知的批量请求没有响应，与JSON模式一样执行后返回202
+            if (
+                isinstance(body, list) and body and session["response_mode"] != "json"
+                and not all(is_notification(message) for message in body)
+            ):
+                log.info("发送流式批量响应", session_id=session_id, size=len(body))
+                return EventStream(stream_batch(body, session_id, session["channel"]))
+            
+            # 流式会话中带 "stream": true 的file://资源读取：文件按块作为连续的SSE事件发送
+            if session["response_mode"] != "json" and is_file_stream_request(body):
+                log.info("分块发送文件资源", session_id=session_id, uri=body["params"]["uri"])
+                return EventStream(stream_file(body, session["channel"]))
+            
+            # tree://资源同理：遍历目录树时每批条目作为一个SSE事件发送
+            if session["response_mode"] != "json" and is_tree_stream_request(body):
+                log.info("分批发送目录树", session_id=session_id, uri=body["params"]["uri"])
+                return EventStream(stream_tree(body, session["channel"]))
+            
             result = await process_request(body, session_id)
             
+            # 批量请求全部是通知时没有需要返回的内容
+            if isinstance(result, list) and not result:
+                return Response(status_code=202)
+            
             # 根据会话的响应模式决定如何返回结果
-            if sessions[session_id]["response_mode"] == "json":
-                logger.info(f"发送JSON响应: 会话ID={session_id}")
-                return JSONResponse(
+            if session["response_mode"] == "json":
+                return FastJSONResponse(
                     content=result,
                     headers={"Content-Type": "application/json"}
                 )
             else:
-                logger.info(f"发送流式响应: 会话ID={session_id}")
-                # 对于流式会话，将结果放入队列 (队列由之前的StreamingResponse消费)
-                for item in format_as_sse(result):
-                    await sessions[session_id]["queue"].put(item)
-                # 不要返回空Response，而是返回一个StreamingResponse
+                # 每个请求的结果通过各自的短流返回，发送完即关闭
                 return StreamingResponse(
-                    stream_response(session_id),
+                    stream_items(session["channel"].record(result)),
                     media_type="text/event-stream"
                 )
         else:
             # 无效请求
-            logger.warning(f"无效请求: 会话ID={session_id}")
-            return JSONResponse(
+            log.warning("无效请求: 会话ID无效或缺失", session_id=session_id)
+            metrics.RPC_ERRORS.inc("unknown", "-32000")
+            return FastJSONResponse(
                 status_code=400,
                 content={
                     "jsonrpc": "2.0",
@@ -164,7 +282,8 @@ async def handle_mcp_request(request: Request, background_tasks: BackgroundTasks
     
     except Exception as e:
         logger.error(f"处理MCP请求时出错: {str(e)}", exc_info=True)
-        return JSONResponse(
+        metrics.RPC_ERRORS.inc("unknown", "-32603")
+        return FastJSONResponse(
             status_code=500,
             content={
                 "jsonrpc": "2.0",
@@ -222,144 +341,158 @@ async def process_initialize_request(body: Union[Dict, List], session_id: str) -
             "id": request_id
         }
 
-async def process_request(body: Union[Dict, List], session_id: str) -> Dict:
-    """处理常规MCP请求"""
-    # 实际实现中，这里应该根据请求方法调用mcp实例的对应方法
-    # 简化版本：根据方法类型返回不同的响应
+async def process_request(body: Union[Dict, List], session_id: str) -> Union[Dict, List[Dict]]:
+    """处理常规MCP请求，通过分发表调用对应的处理函数"""
+    start = time.perf_counter()
     if isinstance(body, list):
-        # 批量请求处理
-        return {"jsonrpc": "2.0", "result": "批量处理尚未实现", "id": "batch"}
-    
-    method = body.get("method", "")
-    params = body.get("params", {})
-    request_id = body.get("id", "1")
+        # 批量请求处理：并发执行，按请求顺序返回响应数组
+        result = await execute_batch(body, lambda message: dispatcher.dispatch(message, session_id))
+        metrics.PROCESS_DURATION.observe(time.perf_counter() - start, "batch")
+        return result
     
-    if method == "list_tools":
-        # 返回工具列表
-        return {
-            "jsonrpc": "2.0",
-            "result": {
-                "tools": [
-                    {"name": "calculate_sum", "description": "计算数字列表的总和"},
-                    {"name": "calculate_average", "description": "计算数字列表的平均值"},
-                    {"name": "calculate_stats", "description": "计算数字列表的基本统计信息"},
-                    {"name": "get_user_info", "description": "获取用户信息"},
-                    {"name": "validate_user", "description": "验证用户ID是否有效"},
-                    {"name": "health", "description": "健康检查工具"}
-                ]
-            },
-            "id": request_id
-        }
-    elif method == "list_resources":
-        # 返回资源列表
-        return {
-            "jsonrpc": "2.0",
-            "result": {
-                "resources": [
-                    {"name": "dir", "description": "获取目录内容"},
-                    {"name": "file", "description": "获取文件内容"}
-                ]
-            },
-            "id": request_id
-        }
-    elif method == "list_prompts":
-        # 返回提示模板列表
-        return {
-            "jsonrpc": "2.0",
-            "result": {
-                "prompts": [
-                    {"name": "review_code", "description": "代码审查提示"},
-                    {"name": "suggest_tests", "description": "测试建议提示"},
-                    {"name": "generate_commit_message", "description": "生成Git提交消息"},
-                    {"name": "generate_api_docs", "description": "生成API文档"}
-                ]
-            },
-            "id": request_id
-        }
-    elif method == "call_tool":
-        # 调用工具
-        tool_name = params.get("name", "")
-        tool_params = params.get("parameters", {})
-        
-        if tool_name == "calculate_sum":
-            numbers = tool_params.get("numbers", [])
-            result = sum(numbers)
-            return {
-                "jsonrpc": "2.0",
-                "result": {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": str(result)
-                        }
-                    ]
-                },
-                "id": request_id
-            }
-        elif tool_name == "health":
-            return {
-                "jsonrpc": "2.0",
-                "result": {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({"status": "ok", "service": "crew-ai-mcp"})
-                        }
-                    ]
-                },
-                "id": request_id
-            }
-        else:
-            return {
-                "jsonrpc": "2.0",
-                "error": {
-                    "code": -32601,
-                    "message": f"未知工具: {tool_name}"
-                },
-                "id": request_id
-            }
-    else:
-        # 未知方法
-        return {
-            "jsonrpc": "2.0",
-            "error": {
-                "code": -32601,
-                "message": f"未知方法: {method}"
-            },
-            "id": request_id
-        }
+    result = await dispatcher.dispatch(body, session_id)
+    metrics.PROCESS_DURATION.observe(time.perf_counter() - start, "single")
+    return result
 
-async def stream_response(session_id: str):
-    """流式响应生成器"""
-    queue = sessions[session_id]["queue"]
-    try:
-        while True:
-            # 从队列中获取下一个SSE事件
-            data = await queue.get()
-            yield data
-            
-            # 标记任务完成
-            queue.task_done()
-    except asyncio.CancelledError:
-        logger.info(f"会话 {session_id} 的流已取消")
+def catalog_response(if_none_match: Optional[str], kind: str, request_id: Any, session: Dict[str, Any]) -> Response:
+    """返回缓存的目录列表，If-None-Match与ETag匹配时返回304"""
+    data, etag = dispatcher.catalog.response_bytes(kind, request_id)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    if session["response_mode"] == "json":
+        return Response(content=data, media_type="application/json", headers={"ETag": etag})
+    return StreamingResponse(
+        stream_items([session["channel"].record_bytes(data)]),
+        media_type="text/event-stream",
+        headers={"ETag": etag}
+    )
+
+async def stream_batch(body: List, session_id: str, channel: SessionChannel):
+    """流式批量响应生成器，每个请求完成后立即发送其结果，全部完成后结束"""
+    async for _, response in iter_batch(body, lambda message: dispatcher.dispatch(message, session_id)):
+        for item in channel.record(response):
+            metrics.SSE_EVENTS.inc("response")
+            metrics.SSE_BYTES.inc("response", amount=len(item))
+            yield item
+
+def _is_stream_request(body: Any, scheme: str) -> bool:
+    """是否是带 "stream": true、URI以scheme开头的资源读取请求"""
+    if not isinstance(body, dict) or body.get("method") != "read_resource":
+        return False
+    params = body.get("params")
+    return (
+        isinstance(params, dict) and params.get("stream") is True
+        and isinstance(params.get("uri"), str) and params["uri"].startswith(scheme)
+    )
+
+def is_file_stream_request(body: Any) -> bool:
+    """是否是要求分块发送的file://资源读取请求"""
+    return _is_stream_request(body, "file://")
 
-async def process_mcp_queue(session_id: str):
-    """处理MCP响应队列的后台任务"""
+def is_tree_stream_request(body: Any) -> bool:
+    """是否是要求分批发送的tree://资源读取请求"""
+    return _is_stream_request(body, "tree://")
+
+async def stream_file(body: Dict[str, Any], channel: SessionChannel):
+    """分块发送文件资源
+    
+    每块是一个notifications/resources/chunk通知 (带本块的字节偏移)，最后发送
+    read_resource的响应，其中streamed字段给出块数、字节数和下一次读取的偏移。
+    文件通过固定大小的缓冲区在文件I/O线程池中逐块读取，内存中只有当前一块；
+    块事件不进入重放缓冲区，中断后客户端可以用 ?offset= 从收到的最后一块之后
+    继续读取。
+    """
+    start = time.perf_counter()
+    request_id = body.get("id", "1")
+    uri = body["params"]["uri"]
+    chunks = 0
+    next_offset = 0
     try:
-        # 此任务会在后台运行，处理发送到客户端的通知
-        logger.info(f"启动队列处理，会话ID={session_id}")
+        path, file_range = split_query(uri[len("file://"):])
+        if file_range.first_line is not None:
+            raise ValueError("Line ranges cannot be streamed, use offset/length")
+        next_offset = file_range.offset
+        reader = iter_chunks(resolve_path(path), file_range.offset, file_range.length)
+        try:
+            while True:
+                # 每一块都在文件I/O线程池中读取
+                chunk = await file_io.run(next, reader, None, op="read_chunk")
+                if chunk is None:
+                    break
+                offset, count, text = chunk
+                chunks += 1
+                next_offset = offset + count
+                item = encode_sse({
+                    "jsonrpc": "2.0",
+                    "method": "notifications/resources/chunk",
+                    "params": {"requestId": request_id, "uri": uri, "offset": offset, "text": text}
+                })
+                metrics.SSE_EVENTS.inc("response")
+                metrics.SSE_BYTES.inc("response", amount=len(item))
+                yield item
+        finally:
+            # 读取超时时线程可能仍在执行这个生成器，结束后由垃圾回收关闭文件
+            if not reader.gi_running:
+                reader.close()
+        response = make_result(
+            {
+                "contents": [],
+                "streamed": {
+                    "chunks": chunks,
+                    "bytes": next_offset - file_range.offset,
+                    "nextOffset": next_offset
+                }
+            },
+            request_id
+        )
     except Exception as e:
-        logger.error(f"处理队列时出错: {str(e)}", exc_info=True)
+        logger.error(f"分块读取文件资源 {uri} 时出错: {str(e)}")
+        response = make_error(INTERNAL_ERROR, f"读取资源时出错: {str(e)}", request_id)
+    metrics.observe_rpc("read_resource", time.perf_counter() - start, response)
+    for item in channel.record(response):
+        metrics.SSE_EVENTS.inc("response")
+        metrics.SSE_BYTES.inc("response", amount=len(item))
+        yield item
 
-def format_as_sse(data: Dict) -> List[str]:
-    """将数据格式化为SSE事件"""
+async def stream_tree(body: Dict[str, Any], channel: SessionChannel):
+    """分批发送目录树
+    
+    目录在文件I/O线程池中并行扫描，每扫描完一批条目发送一个
+    notifications/resources/chunk通知，其中entries是这一批未被忽略的条目；
+    最后发送read_resource的响应，其中streamed字段给出条目数、目录数和是否被截断。
+    客户端断开时停止遍历，尚未开始的目录不再扫描。
+    """
+    start = time.perf_counter()
+    request_id = body.get("id", "1")
+    uri = body["params"]["uri"]
+    chunks = 0
     try:
-        json_data = json.dumps(data)
-        # 确保使用正确的SSE格式：data: 后面是数据，以\n\n结尾
-        return [f"data: {json_data}\n\n"]
+        path, query = tree_walk.split_query(uri[len("tree://"):])
+        walk = tree_walk.TreeWalk(resolve_path(path), query)
+        batches = walk.batches()
+        try:
+            async for entries in batches:
+                chunks += 1
+                item = encode_sse({
+                    "jsonrpc": "2.0",
+                    "method": "notifications/resources/chunk",
+                    "params": {"requestId": request_id, "uri": uri, "entries": entries}
+                })
+                metrics.SSE_EVENTS.inc("response")
+                metrics.SSE_BYTES.inc("response", amount=len(item))
+                yield item
+        finally:
+            # 客户端断开时立即取消尚未完成的目录扫描
+            await batches.aclose()
+        response = make_result({"contents": [], "streamed": {"chunks": chunks, **walk.summary()}}, request_id)
     except Exception as e:
-        logger.error(f"格式化SSE事件时出错: {str(e)}")
-        return [f"data: {{\"error\": \"格式化SSE事件时出错: {str(e)}\"}}\n\n"]
+        logger.error(f"遍历目录树资源 {uri} 时出错: {str(e)}")
+        response = make_error(INTERNAL_ERROR, f"读取资源时出错: {str(e)}", request_id)
+    metrics.observe_rpc("read_resource", time.perf_counter() - start, response)
+    for item in channel.record(response):
+        metrics.SSE_EVENTS.inc("response")
+        metrics.SSE_BYTES.inc("response", amount=len(item))
+        yield item
 
 def is_initialize_request(body: Union[Dict, List]) -> bool:
     """检查是否是初始化请求"""
@@ -367,12 +500,12 @@ def is_initialize_request(body: Union[Dict, List]) -> bool:
         return any(isinstance(msg, dict) and msg.get("method") == "initialize" for msg in body)
     return isinstance(body, dict) and body.get("method") == "initialize"
 
-def get_method_from_body(body: Union[Dict, List]) -> str:
-    """从请求体中获取方法名"""
-    if isinstance(body, list):
-        methods = [msg.get("method") for msg in body if isinstance(msg, dict) and "method" in msg]
-        return ", ".join(methods)
-    return body.get("method", "unknown") if isinstance(body, dict) else "unknown"
+def get_route(body: Any) -> str:
+    """请求日志采样使用的路由：单个请求为方法名，批量请求为batch"""
+    if isinstance(body, dict):
+        method = body.get("method")
+        return method if isinstance(method, str) else "unknown"
+    return "batch" if isinstance(body, list) else "unknown"
 
 def get_id_from_body(body: Union[Dict, List]) -> Optional[str]:
     """从请求体中获取ID"""
@@ -383,9 +516,8 @@ def get_id_from_body(body: Union[Dict, List]) -> Optional[str]:
         return None
     return body.get("id") if isinstance(body, dict) else None
 
-def get_response_mode(request: Request) -> str:
+def get_response_mode(accept_header: str) -> str:
     """根据Accept头决定响应模式"""
-    accept_header = request.headers.get("accept", "")
     if "text/event-stream" in accept_header:
         return "stream"
     return "json"
@@ -394,7 +526,59 @@ def get_response_mode(request: Request) -> str:
 @app.get("/health")
 async def health_check():
     """健康检查端点"""
-    return {"status": "ok", "service": "mcp-streamable-http-server"}
+    return {
+        "status": "ok",
+        "service": "mcp-streamable-http-server",
+        "sessions": sessions.stats(),
+        "sse": sse_stats(),
+        "logging": request_log.stats(),
+        "accumulators": accumulators.stats(),
+        "scheduler": scheduler.stats(),
+        "file_io": file_io.stats(),
+        "file_cache": file_cache.stats(),
+        "memo": memoize.stats(),
+        "single_flight": dispatcher.flights.stats()
+    }
+
+def sse_stats() -> Dict[str, Any]:
+    """本进程所有会话SSE通道的汇总统计"""
+    channels = [session["channel"].stats() for _, session in sessions.local_sessions()]
+    return {
+        "attached": sum(1 for channel in channels if channel["attached"]),
+        "replay_events": sum(channel["replay_events"] for channel in channels),
+        "replay_bytes": sum(channel["replay_bytes"] for channel in channels)
+    }
+
+# Prometheus指标端点
+@app.get("/metrics")
+async def metrics_endpoint():
+    """以Prometheus文本格式输出运行指标"""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+# 单个会话的统计端点
+@app.get("/sessions/{session_id}")
+async def session_stats(session_id: str):
+    """获取会话状态及其SSE通道的连接和重放缓冲区统计信息"""
+    session = sessions.peek(session_id)
+    if session is None:
+        return JSONResponse(status_code=404, content={"error": f"会话不存在: {session_id}"})
+    return {
+        "id": session_id,
+        "status": session.get("status"),
+        "response_mode": session.get("response_mode"),
+        "sse": session["channel"].stats()
+    }
+
+# 目录列表的条件GET端点
+@app.get("/catalog/{kind}")
+async def get_catalog(kind: str, request: Request):
+    """获取工具、资源或提示模板列表，支持If-None-Match条件请求"""
+    if kind not in ("tools", "resources", "prompts"):
+        return JSONResponse(status_code=404, content={"error": f"未知目录: {kind}"})
+    payload, etag = dispatcher.catalog.payload(kind)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=payload, media_type="application/json", headers={"ETag": etag})
 
 # 添加根路径处理
 @app.get("/")
@@ -444,8 +628,47 @@ Accept: application/json
 
 # 添加MCP GET方法支持
 @app.get("/mcp")
-async def mcp_get():
-    """MCP GET方法说明"""
+async def mcp_get(request: Request):
+    """
+    MCP GET方法
+    带有mcp-session-id并接受text/event-stream时连接会话的长连接SSE通道，否则返回使用说明
+    携带Last-Event-ID请求头时先重放该ID之后的事件
+    """
+    if get_response_mode(request.headers.get("accept", "")) == "stream":
+        session_id = request.headers.get("mcp-session-id")
+        session = await sessions.get(session_id)
+        if session is None:
+            return FastJSONResponse(
+                status_code=400,
+                content={
+                    "jsonrpc": "2.0",
+                    "error": {
+                        "code": -32000,
+                        "message": "无效请求: 会话ID无效或缺失"
+                    },
+                    "id": None
+                }
+            )
+        # 事件ID只在发出它的worker内有效，其他worker或已重建的通道发出的ID无法恢复
+        last_event_id = parse_last_event_id(request.headers.get("last-event-id"))
+        if last_event_id is not None and not session["channel"].issued(last_event_id):
+            return FastJSONResponse(
+                status_code=400,
+                content={
+                    "jsonrpc": "2.0",
+                    "error": {
+                        "code": -32000,
+                        "message": f"无效请求: 未知的Last-Event-ID {last_event_id}，请不带Last-Event-ID重新连接"
+                    },
+                    "id": None
+                }
+            )
+        return StreamingResponse(
+            session["channel"].stream(session_id, last_event_id, request.is_disconnected),
+            media_type="text/event-stream",
+            headers={"mcp-session-id": session_id}
+        )
+    
     return JSONResponse(
         content={
             "message": "MCP接口只接受POST请求",
@@ -465,4 +688,8 @@ async def mcp_get():
             }
         },
         headers={"Content-Type": "application/json"}
-    ) 
\ No newline at end of file
+    )
+
+# POST /mcp的ASGI快速路径，其余请求仍由FastAPI应用处理
+# 启动脚本在MCP_ASGI_FAST_PATH=1时使用fast_app代替app
+fast_app = MCPFastPath(app, handle_mcp_message, **CORS_OPTIONS)
@@ -10,13 +10,25 @@ def main():
     # 从环境变量获取端口，默认为3000
     # Heroku会提供PORT环境变量
     port = int(os.environ.get("PORT", 3000))
-    print(f"启动 MCP StreamableHTTP 服务器在端口 {port}...")
+    # worker数量，Heroku会根据dyno类型提供WEB_CONCURRENCY环境变量
+    workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+    print(f"启动 MCP StreamableHTTP 服务器在端口 {port}, workers={workers}...")
+    
+    # 多个worker之间需要共享会话，进程内存储只对创建会话的worker可见
+    session_store = os.environ.get("MCP_SESSION_STORE", "memory")
+    if workers > 1 and session_store == "memory":
+        print("警告: 多个worker使用进程内会话存储，请设置MCP_SESSION_STORE=sqlite:///sessions.db")
+    
+    # MCP_ASGI_FAST_PATH=1时POST /mcp绕过FastAPI路由，直接由ASGI快速路径处理
+    fast_path = os.environ.get("MCP_ASGI_FAST_PATH", "0").lower() in ("1", "true", "yes")
+    app_name = "fast_app" if fast_path else "app"
     
     # 使用字符串形式指定应用程序，这在Heroku环境中是必需的
     # 这样可以正确设置workers和reload选项
-    uvicorn.run("src.streamable_http_server:app", 
+    uvicorn.run(f"src.streamable_http_server:{app_name}", 
                host="0.0.0.0", 
                port=port, 
+               workers=workers,
                log_level="info")
 
 if __name__ == "__main__":
@@ -0,0 +1,64 @@
+"""
+增量统计工具模块
+分批推入数据并查询累计统计信息：打开累加器、推入数据、查询、关闭
+累加器保存在当前会话的存储中 (见src/accumulators.py)，会话结束时自动释放
+"""
+from typing import List, Optional
+from ..mcp_server import mcp
+from ..accumulators import accumulators, TDIGEST_COMPRESSION
+from ..array_input import Numbers, decode_numbers
+from ..stats_engine import check_percentiles
+from ..request_context import current_session_id
+
+def _session_id() -> str:
+    """当前会话ID，累加器工具必须在会话中调用"""
+    session_id = current_session_id()
+    if session_id is None:
+        raise ValueError("Accumulator tools require an MCP session")
+    return session_id
+
+@mcp.tool()
+async def open_accumulator(compression: int = TDIGEST_COMPRESSION) -> dict:
+    """打开一个增量统计累加器
+    
+    Args:
+        compression: t-digest压缩参数 (10-1000)，越大百分位数越精确、占用内存越多
+    """
+    accumulator_id = await accumulators.open(_session_id(), compression)
+    return {"accumulator_id": accumulator_id}
+
+@mcp.tool()
+async def push_to_accumulator(accumulator_id: str, numbers: Numbers) -> dict:
+    """向累加器推入一批数字
+    
+    Args:
+        accumulator_id: open_accumulator返回的累加器ID
+        numbers: 要推入的数字列表，或 {"dtype": "float64", "data": "<base64>"} 形式的编码数组
+    """
+    accumulator = await accumulators.push(_session_id(), accumulator_id, decode_numbers(numbers))
+    return {"accumulator_id": accumulator_id, "count": accumulator.stats.count, "chunks": accumulator.chunks}
+
+@mcp.tool()
+async def get_accumulator_stats(accumulator_id: str, percentiles: Optional[List[float]] = None) -> dict:
+    """查询累加器的累计统计信息
+    
+    返回与calculate_stats相同的字段，中位数和百分位数是t-digest近似值。
+    
+    Args:
+        accumulator_id: open_accumulator返回的累加器ID
+        percentiles: 要计算的百分位数 (0-100)，例如 [90, 99]
+    """
+    return (await accumulators.get(_session_id(), accumulator_id)).describe(percentiles or ())
+
+@mcp.tool()
+async def close_accumulator(accumulator_id: str, percentiles: Optional[List[float]] = None) -> dict:
+    """关闭累加器并返回最终的统计信息
+    
+    Args:
+        accumulator_id: open_accumulator返回的累加器ID
+        percentiles: 要计算的百分位数 (0-100)，例如 [90, 99]
+    """
+    # 先检查参数，参数无效时不关闭累加器
+    percentiles = check_percentiles(percentiles or ())
+    accumulator = await accumulators.close(_session_id(), accumulator_id)
+    return accumulator.describe(percentiles)
@@ -1,43 +1,69 @@
 """
 计算工具模块
 提供各种数学计算功能
+统计计算由src/stats_engine.py完成，编码数组 (以及describe的较长列表) 在安装了NumPy时使用向量化计算
+numbers参数也可以是base64编码的float32/float64数组 (见src/array_input.py)
+输入较大时在进程池中计算，避免阻塞事件循环 (见src/scheduler.py)
+较小输入的结果按参数缓存 (见src/memoize.py)，相同的并发调用合并执行 (见src/single_flight.py)
 """
-from typing import List
+from typing import List, Optional
+import os
 from ..mcp_server import mcp
+from .. import stats_engine
+from ..array_input import Numbers, decode_numbers, numbers_size
+from ..scheduler import scheduled
+from ..memoize import memoized
+from ..single_flight import coalesce
+
+# 输入元素数量达到此值时在进程池中计算，更小的输入直接计算比跨进程传递参数更快
+OFFLOAD_MIN_SIZE = int(os.environ.get("MCP_CALCULATOR_OFFLOAD_MIN_SIZE", 200000))
+# 计算工具的超时时间 (秒)
+TIMEOUT = float(os.environ.get("MCP_CALCULATOR_TIMEOUT", 30))
+
+def is_large(numbers: Numbers, *args, **kwargs) -> bool:
+    """输入是否大到需要在进程池中计算"""
+    return numbers_size(numbers) >= OFFLOAD_MIN_SIZE
+
+def is_small(numbers: Numbers, *args, **kwargs) -> bool:
+    """输入是否小到值得缓存结果或合并并发调用 (大输入计算键的开销接近重新计算)"""
+    return not is_large(numbers)
 
 @mcp.tool()
-async def calculate_sum(numbers: List[float]) -> float:
+@coalesce(when=is_small)
+@memoized(when=is_small)
+@scheduled(cpu_bound=True, when=is_large, timeout=TIMEOUT)
+async def calculate_sum(numbers: Numbers) -> float:
     """计算数字列表的总和
     
     Args:
-        numbers: 要计算的数字列表
+        numbers: 要计算的数字列表，或 {"dtype": "float64", "data": "<base64>"} 形式的编码数组
     """
-    return sum(numbers)
+    return stats_engine.total(decode_numbers(numbers))
 
 @mcp.tool()
-async def calculate_average(numbers: List[float]) -> float:
+@coalesce(when=is_small)
+@memoized(when=is_small)
+@scheduled(cpu_bound=True, when=is_large, timeout=TIMEOUT)
+async def calculate_average(numbers: Numbers) -> float:
     """计算数字列表的平均值
     
     Args:
-        numbers: 要计算的数字列表
+        numbers: 要计算的数字列表，或 {"dtype": "float64", "data": "<base64>"} 形式的编码数组
     """
-    if not numbers:
-        raise ValueError("Numbers list cannot be empty")
-    return sum(numbers) / len(numbers)
+    return stats_engine.mean(decode_numbers(numbers))
 
 @mcp.tool()
-async def calculate_stats(numbers: List[float]) -> dict:
+@coalesce(when=is_small)
+@memoized(when=is_small)
+@scheduled(cpu_bound=True, when=is_large, timeout=TIMEOUT)
+async def calculate_stats(numbers: Numbers, percentiles: Optional[List[float]] = None) -> dict:
     """计算数字列表的基本统计信息
     
+    返回总和、平均值、最小值、最大值、数量、方差、标准差 (总体) 和中位数，
+    指定percentiles时还返回对应的百分位数 (线性插值)。
+    
     Args:
-        numbers: 要计算的数字列表
+        numbers: 要计算的数字列表，或 {"dtype": "float64", "data": "<base64>"} 形式的编码数组
+        percentiles: 要计算的百分位数 (0-100)，例如 [90, 99]
     """
-    if not numbers:
-        raise ValueError("Numbers list cannot be empty")
-    return {
-        "sum": sum(numbers),
-        "average": sum(numbers) / len(numbers),
-        "min": min(numbers),
-        "max": max(numbers),
-        "count": len(numbers)
-    } 
\ No newline at end of file
+    return stats_engine.describe(decode_numbers(numbers), percentiles or ())
@@ -0,0 +1,10 @@
+"""
+健康检查工具模块
+提供服务健康状态检查功能
+"""
+from ..mcp_server import mcp
+
+@mcp.tool()
+async def health() -> dict:
+    """健康检查工具"""
+    return {"status": "ok", "service": "crew-ai-mcp"}
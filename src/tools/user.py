@@ -4,8 +4,11 @@
 """
 from typing import Dict, Any
 from ..mcp_server import mcp
+from ..memoize import memoized
+from ..single_flight import coalesce
 
 @mcp.tool()
+@coalesce
 async def get_user_info(user_id: str) -> Dict[str, Any]:
     """获取用户信息
     
@@ -21,6 +24,8 @@ async def get_user_info(user_id: str) -> Dict[str, Any]:
     }
 
 @mcp.tool()
+@coalesce
+@memoized()
 async def validate_user(user_id: str) -> bool:
     """验证用户ID是否有效
     
@@ -0,0 +1,243 @@
+"""
+请求追踪
+为单个请求记录各阶段的耗时 (parse、dispatch、tool、serialize、write)，
+请求结束后追加写入本地文件，用于定位热路径上的性能退化。
+
+请求携带 x-mcp-trace: 1 请求头时启用追踪，响应中返回 x-mcp-trace-id。
+当前请求的追踪保存在contextvar中，批量请求中并发执行的子任务会继承它，
+分发器和工具执行代码无需传递参数即可记录span；未启用追踪时span()
+返回一个共享的空对象，几乎没有开销。
+
+配置 (环境变量):
+- MCP_TRACE: header (默认，按请求头启用)、all (追踪所有请求) 或 off
+- MCP_TRACE_FILE: 输出文件，默认traces.jsonl
+- MCP_TRACE_FORMAT: jsonl (每个请求一行) 或 chrome (Chrome trace事件，可在
+  chrome://tracing 或 Perfetto 中打开)
+"""
+from typing import Any, AsyncIterator, Dict, List, Mapping, Optional, Tuple
+from contextvars import ContextVar
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+import functools
+
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+TRACE_MODE = os.environ.get("MCP_TRACE", "header")
+TRACE_FILE = os.environ.get("MCP_TRACE_FILE", "traces.jsonl")
+TRACE_FORMAT = os.environ.get("MCP_TRACE_FORMAT", "jsonl")
+
+# 启用追踪的请求头和返回追踪ID的响应头
+TRACE_HEADER = "x-mcp-trace"
+TRACE_ID_HEADER = "x-mcp-trace-id"
+
+_current: ContextVar[Optional["Trace"]] = ContextVar("mcp_trace", default=None)
+_write_lock = threading.Lock()
+
+
+class Trace:
+    """一个请求的追踪记录，span的时间相对于请求开始"""
+
+    def __init__(self):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.started_at = time.time()
+        self.start_ns = time.perf_counter_ns()
+        self.attrs: Dict[str, Any] = {}
+        # (名称, 开始纳秒, 结束纳秒, 属性)
+        self.spans: List[Tuple[str, int, int, Dict[str, Any]]] = []
+
+    def add(self, name: str, start_ns: int, end_ns: int, attrs: Dict[str, Any]) -> None:
+        self.spans.append((name, start_ns - self.start_ns, end_ns - self.start_ns, attrs))
+
+    def finish(self) -> None:
+        """结束追踪并写入文件"""
+        duration_ns = time.perf_counter_ns() - self.start_ns
+        try:
+            export(self, duration_ns)
+        except Exception as e:
+            logger.error(f"写入追踪记录时出错: {str(e)}")
+
+
+class Span:
+    """记录一个阶段耗时的上下文管理器"""
+    __slots__ = ("trace", "name", "attrs", "start_ns")
+
+    def __init__(self, trace: Trace, name: str, attrs: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self) -> "Span":
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.trace.add(self.name, self.start_ns, time.perf_counter_ns(), self.attrs)
+
+
+class _NoopSpan:
+    """未启用追踪时使用的空span"""
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        return None
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def span(name: str, **attrs: Any) -> Any:
+    """在当前请求的追踪中记录一个阶段，未启用追踪时不做任何事"""
+    trace = _current.get()
+    if trace is None:
+        return NOOP_SPAN
+    return Span(trace, name, attrs)
+
+
+def tag(**attrs: Any) -> None:
+    """给当前请求的追踪添加属性 (例如路由和会话ID)"""
+    trace = _current.get()
+    if trace is not None:
+        trace.attrs.update(attrs)
+
+
+def current() -> Optional[Trace]:
+    """当前请求的追踪，未启用时返回None"""
+    return _current.get()
+
+
+def should_trace(headers: Mapping[str, str]) -> bool:
+    """根据MCP_TRACE和请求头决定是否追踪该请求"""
+    if TRACE_MODE == "all":
+        return True
+    if TRACE_MODE == "off":
+        return False
+    return headers.get(TRACE_HEADER, "").lower() in ("1", "true", "yes")
+
+
+def traced(func: Any) -> Any:
+    """追踪MCP消息处理函数 (参数为请求体字节和请求头)
+
+    处理函数返回后，响应写出阶段 (write) 一直持续到响应发送完毕，
+    通过响应的后台任务在线程池中结束追踪并写入文件。
+    流式响应的生成器在处理函数返回后才执行，每一步都重新绑定追踪，
+    其中的dispatch和tool等span同样会被记录。
+    """
+    @functools.wraps(func)
+    async def wrapper(raw_body: bytes, headers: Mapping[str, str]) -> Any:
+        if not should_trace(headers):
+            return await func(raw_body, headers)
+
+        trace = Trace()
+        token = _current.set(trace)
+        try:
+            with Span(trace, "handle", {"bytes": len(raw_body)}):
+                response = await func(raw_body, headers)
+        finally:
+            _current.reset(token)
+
+        if isinstance(response, StreamingResponse):
+            response.body_iterator = bind(trace, response.body_iterator)
+        write = Span(trace, "write", {"status": response.status_code}).__enter__()
+
+        def finish() -> None:
+            write.__exit__(None, None, None)
+            trace.finish()
+
+        if response.background is None:
+            response.background = BackgroundTask(finish)
+        else:
+            previous = response.background
+
+            async def run_both() -> None:
+                await previous()
+                await run_in_threadpool(finish)
+
+            response.background = BackgroundTask(run_both)
+        response.headers[TRACE_ID_HEADER] = trace.trace_id
+        return response
+    return wrapper
+
+
+async def bind(trace: Trace, iterator: AsyncIterator[Any]) -> AsyncIterator[Any]:
+    """在追踪上下文中执行流式响应的生成器
+
+    每一步都在同一个上下文中设置和恢复contextvar，因此生成器的各步可以在
+    不同的任务中执行 (见src/sse.py的with_heartbeats)，其间创建的子任务也会继承追踪。
+    """
+    try:
+        while True:
+            token = _current.set(trace)
+            try:
+                item = await iterator.__anext__()
+            except StopAsyncIteration:
+                return
+            finally:
+                _current.reset(token)
+            yield item
+    finally:
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            token = _current.set(trace)
+            try:
+                await aclose()
+            finally:
+                _current.reset(token)
+
+
+def to_jsonl(trace: Trace, duration_ns: int) -> str:
+    """一个请求一行JSON，时间单位为微秒"""
+    return json.dumps({
+        "trace_id": trace.trace_id,
+        "ts": trace.started_at,
+        "duration_us": duration_ns / 1000,
+        **trace.attrs,
+        "spans": [
+            {"name": name, "start_us": start / 1000, "duration_us": (end - start) / 1000, **attrs}
+            for name, start, end, attrs in trace.spans
+        ]
+    }, ensure_ascii=False, default=str) + "\n"
+
+
+def to_chrome(trace: Trace, duration_ns: int) -> str:
+    """Chrome trace的完整事件 (ph=X)，每个请求占一行 (tid)，便于并排比较"""
+    base_us = trace.started_at * 1e6
+    pid = os.getpid()
+    tid = int(trace.trace_id[:8], 16)
+    events = [{
+        "name": "request", "cat": "mcp", "ph": "X", "ts": base_us, "dur": duration_ns / 1000,
+        "pid": pid, "tid": tid, "args": {"trace_id": trace.trace_id, **trace.attrs}
+    }]
+    events.extend(
+        {
+            "name": name, "cat": "mcp", "ph": "X", "ts": base_us + start / 1000, "dur": (end - start) / 1000,
+            "pid": pid, "tid": tid, "args": attrs
+        }
+        for name, start, end, attrs in trace.spans
+    )
+    # Chrome trace的JSON数组格式允许省略结尾的 "]"，因此可以逐个事件追加
+    return "".join(json.dumps(event, ensure_ascii=False, default=str) + ",\n" for event in events)
+
+
+def export(trace: Trace, duration_ns: int, path: Optional[str] = None, fmt: Optional[str] = None) -> None:
+    """将追踪记录追加写入文件"""
+    path = path or TRACE_FILE
+    fmt = fmt or TRACE_FORMAT
+    data = to_chrome(trace, duration_ns) if fmt == "chrome" else to_jsonl(trace, duration_ns)
+    with _write_lock:
+        with open(path, "a", encoding="utf-8") as f:
+            if fmt == "chrome" and f.tell() == 0:
+                f.write("[\n")
+            f.write(data)
@@ -0,0 +1,326 @@
+"""
+递归的目录树遍历
+tree:// 资源一次返回整个目录树的清单，代理不必对每一层目录分别请求dir://：
+
+    tree:///path/to/repo?max_depth=4&max_entries=5000&ignore=*.pyc,dist
+
+- 目录树在文件I/O线程池中并行扫描：每次调度从一个目录开始深度优先扫描，
+  得到约MCP_TREE_BATCH个条目后返回这一批条目和尚未扫描的子目录，子目录再分配
+  给其他线程 (每次遍历最多同时进行MCP_TREE_CONCURRENCY个扫描)
+- max_depth: 最大深度，根目录下的条目深度为1；达到深度的目录列出但不展开
+- max_entries: 最多返回的条目数，达到后停止遍历并标记truncated
+- ignore: 逗号分隔的忽略规则 (与.gitignore语法相同)，相对于根目录
+- gitignore: 默认读取遍历到的每个目录中的.gitignore，规则作用于该目录的子树；
+  gitignore=0时不读取。.git目录总是被忽略
+- 不跟随符号链接，符号链接作为条目列出
+
+条目的格式与dir://相同 (类型、大小、修改时间)，name换成相对于根目录的path。
+流式会话中read_resource请求带 "stream": true 时，每批条目作为一个SSE事件
+发送；并行遍历的完成顺序不固定，截断时返回哪些条目也不固定。
+
+.gitignore支持常用的语法：注释、空行、!取反、结尾/只匹配目录、包含/的
+规则相对于.gitignore所在目录、*、?、[...]和**。
+
+配置 (环境变量):
+- MCP_TREE_MAX_DEPTH: 默认的最大深度，默认32
+- MCP_TREE_MAX_ENTRIES: 默认的最多条目数，也是max_entries参数的上限，默认100000
+- MCP_TREE_CONCURRENCY: 每次遍历同时进行的扫描数，默认8
+- MCP_TREE_BATCH: 每次扫描的条目数 (不拆分单个目录)，默认1000
+"""
+from typing import Any, AsyncIterator, Dict, List, Optional, Pattern, Tuple
+from urllib.parse import parse_qs
+from collections import deque
+import os
+import re
+import asyncio
+import logging
+
+from .file_io import file_io
+from .dir_listing import describe_entry
+
+logger = logging.getLogger(__name__)
+
+MAX_DEPTH = int(os.environ.get("MCP_TREE_MAX_DEPTH", 32))
+MAX_ENTRIES = int(os.environ.get("MCP_TREE_MAX_ENTRIES", 100000))
+CONCURRENCY = int(os.environ.get("MCP_TREE_CONCURRENCY", 8))
+BATCH = int(os.environ.get("MCP_TREE_BATCH", 1000))
+
+# 总是忽略的规则
+DEFAULT_IGNORE = (".git/",)
+# 读取.gitignore的最大字节数
+MAX_GITIGNORE_SIZE = 1024 * 1024
+
+
+class TreeQuery:
+    """tree:// URI查询参数"""
+    __slots__ = ("max_depth", "max_entries", "ignore", "gitignore")
+
+    def __init__(
+        self,
+        max_depth: int = MAX_DEPTH,
+        max_entries: int = MAX_ENTRIES,
+        ignore: Tuple[str, ...] = (),
+        gitignore: bool = True
+    ):
+        self.max_depth = max_depth
+        self.max_entries = max_entries
+        self.ignore = ignore
+        self.gitignore = gitignore
+
+    @classmethod
+    def parse(cls, query: str) -> "TreeQuery":
+        params = {key: values[-1] for key, values in parse_qs(query).items()}
+        unknown = set(params) - {"max_depth", "max_entries", "ignore", "gitignore"}
+        if unknown:
+            raise ValueError(f"Unknown tree parameters: {', '.join(sorted(unknown))}")
+        try:
+            max_depth = int(params.get("max_depth", MAX_DEPTH))
+            max_entries = int(params.get("max_entries", MAX_ENTRIES))
+        except ValueError:
+            raise ValueError("max_depth and max_entries must be integers")
+        if max_depth < 1:
+            raise ValueError("max_depth must be at least 1")
+        if not 1 <= max_entries <= MAX_ENTRIES:
+            raise ValueError(f"max_entries must be between 1 and {MAX_ENTRIES}")
+        ignore = tuple(pattern.strip() for pattern in params.get("ignore", "").split(",") if pattern.strip())
+        gitignore = params.get("gitignore", "1").lower() not in ("0", "false", "off", "no")
+        return cls(max_depth, max_entries, ignore, gitignore)
+
+
+def split_query(path: str) -> Tuple[str, TreeQuery]:
+    """把资源路径拆分为根目录路径和查询参数"""
+    path, _, query = path.partition("?")
+    return path, TreeQuery.parse(query) if query else TreeQuery()
+
+
+def translate_glob(pattern: str) -> str:
+    """把gitignore的通配符转换为正则表达式 (*和?不匹配/，**匹配任意层)"""
+    parts: List[str] = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+        elif c == "*":
+            parts.append("[^/]*")
+            i += 1
+        elif c == "?":
+            parts.append("[^/]")
+            i += 1
+        elif c == "[":
+            end = pattern.find("]", i + 2 if pattern.startswith("[!", i) or pattern.startswith("[^", i) else i + 1)
+            if end < 0:
+                parts.append(re.escape(c))
+                i += 1
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                parts.append("[" + body.replace("\\", "\\\\") + "]")
+                i = end + 1
+        elif c == "\\" and i + 1 < n:
+            parts.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            parts.append(re.escape(c))
+            i += 1
+    return "".join(parts)
+
+
+def compile_rule(line: str) -> Optional[Tuple[Pattern, bool, bool]]:
+    """编译一行忽略规则，返回 (正则, 是否取反, 是否只匹配目录)；注释和空行返回None"""
+    line = line.rstrip("\r\n")
+    if not line.endswith("\\ "):
+        line = line.rstrip(" ")
+    if not line or line.startswith("#"):
+        return None
+    negate = line.startswith("!")
+    if negate:
+        line = line[1:]
+    elif line.startswith("\\"):
+        line = line[1:]
+    dir_only = line.endswith("/")
+    line = line.rstrip("/")
+    if not line:
+        return None
+    # 包含/的规则相对于所在目录，否则匹配任意层的名称
+    anchored = "/" in line
+    regex = translate_glob(line.lstrip("/"))
+    if not anchored:
+        regex = "(?:.*/)?" + regex
+    return re.compile(regex), negate, dir_only
+
+
+class IgnoreRules:
+    """按顺序排列的忽略规则，后面的规则优先；子目录的规则追加在父目录之后"""
+    __slots__ = ("rules",)
+
+    def __init__(self, rules: Tuple[Tuple[str, Pattern, bool, bool], ...] = ()):
+        self.rules = rules
+
+    def extend(self, base: str, lines: Any) -> "IgnoreRules":
+        """追加相对于base目录 (根目录为空字符串) 的规则，返回新的规则集"""
+        added = []
+        for line in lines:
+            rule = compile_rule(line)
+            if rule is not None:
+                added.append((base,) + rule)
+        return IgnoreRules(self.rules + tuple(added)) if added else self
+
+    def ignored(self, path: str, is_dir: bool) -> bool:
+        """相对于根目录的路径是否被忽略"""
+        result = False
+        for base, regex, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if base:
+                if not path.startswith(base + "/"):
+                    continue
+                relative = path[len(base) + 1:]
+            else:
+                relative = path
+            if regex.fullmatch(relative):
+                result = not negate
+        return result
+
+
+def read_gitignore(path: str) -> Optional[str]:
+    """读取目录中的.gitignore，不存在或过大时返回None"""
+    try:
+        with open(os.path.join(path, ".gitignore"), "r", encoding="utf-8", errors="replace") as f:
+            if os.fstat(f.fileno()).st_size > MAX_GITIGNORE_SIZE:
+                return None
+            return f.read()
+    except OSError:
+        return None
+
+
+def scan_subtree(
+    root: str,
+    query: TreeQuery,
+    start: Tuple[str, int, IgnoreRules],
+    budget: int
+) -> Tuple[List[Dict[str, Any]], List[Tuple[str, int, IgnoreRules]], int, int]:
+    """从一个目录开始深度优先扫描 (在线程中执行)，条目数达到budget后停止
+
+    返回 (条目, 尚未扫描的子目录, 扫描的目录数, 错误数)，尚未扫描的子目录由调用方
+    分配给其他线程并行扫描。每次调度扫描多个小目录，线程池的调度开销由一批条目
+    分摊；只对未被忽略的条目调用stat。
+    """
+    entries: List[Dict[str, Any]] = []
+    stack = [start]
+    directories = errors = 0
+    while stack and len(entries) < budget:
+        relative, depth, rules = stack.pop()
+        path = os.path.join(root, relative) if relative else root
+        try:
+            with os.scandir(path) as iterator:
+                found = sorted(iterator, key=lambda entry: entry.name)
+        except OSError as e:
+            if not relative:
+                raise
+            # 子目录不可读 (权限或被删除) 时作为错误条目返回，继续遍历其他目录
+            errors += 1
+            entries.append({"path": relative, "type": "error", "error": str(e)})
+            continue
+        directories += 1
+        if query.gitignore and any(entry.name == ".gitignore" for entry in found):
+            gitignore = read_gitignore(path)
+            if gitignore:
+                rules = rules.extend(relative, gitignore.splitlines())
+        children = []
+        for entry in found:
+            name = f"{relative}/{entry.name}" if relative else entry.name
+            is_dir = entry.is_dir(follow_symlinks=False)
+            if rules.ignored(name, is_dir):
+                continue
+            info = describe_entry(entry)
+            del info["name"]
+            entries.append({"path": name, **info})
+            if is_dir and depth + 1 < query.max_depth:
+                children.append((name, depth + 1, rules))
+        # 按名称顺序深度优先
+        stack.extend(reversed(children))
+    return entries, stack, directories, errors
+
+
+class TreeWalk:
+    """并行遍历目录树，按批产出条目列表
+
+    遍历结束后entries、directories和truncated给出汇总信息。
+    batches()提前关闭时 (例如客户端断开) 取消尚未完成的目录扫描。
+    """
+
+    def __init__(self, root: str, query: TreeQuery, concurrency: int = CONCURRENCY, batch: int = BATCH):
+        self.root = root
+        self.query = query
+        self.concurrency = concurrency
+        self.batch = batch
+        self.entries = 0
+        self.directories = 0
+        self.errors = 0
+        self.truncated = False
+
+    def _scan(self, start: Tuple[str, int, IgnoreRules]) -> "asyncio.Future":
+        budget = max(1, min(self.batch, self.query.max_entries - self.entries))
+        return asyncio.ensure_future(file_io.run(scan_subtree, self.root, self.query, start, budget, op="scan_tree"))
+
+    async def batches(self) -> AsyncIterator[List[Dict[str, Any]]]:
+        """按扫描完成的顺序产出条目，每批来自一次线程池调度"""
+        query = self.query
+        rules = IgnoreRules().extend("", DEFAULT_IGNORE + query.ignore)
+        queue = deque([("", 0, rules)])
+        pending: Dict[asyncio.Future, Tuple[str, int, IgnoreRules]] = {}
+        try:
+            while queue or pending:
+                while queue and len(pending) < self.concurrency:
+                    start = queue.popleft()
+                    pending[self._scan(start)] = start
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    start = pending.pop(task)
+                    try:
+                        entries, rest, directories, errors = task.result()
+                    except TimeoutError as e:
+                        if not start[0]:
+                            raise
+                        # 子树扫描超时时作为错误条目返回，继续遍历其他目录
+                        entries, rest, directories, errors = [{"path": start[0], "type": "error", "error": str(e)}], [], 0, 1
+                    self.directories += directories
+                    self.errors += errors
+                    room = query.max_entries - self.entries
+                    if len(entries) > room:
+                        entries, rest = entries[:room], []
+                        self.truncated = True
+                    self.entries += len(entries)
+                    queue.extend(rest)
+                    if entries:
+                        yield entries
+                if self.entries >= query.max_entries and (queue or pending):
+                    self.truncated = True
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def collect(self) -> Dict[str, Any]:
+        """遍历整个目录树，返回按路径排序的清单"""
+        entries: List[Dict[str, Any]] = []
+        async for batch in self.batches():
+            entries.extend(batch)
+        entries.sort(key=lambda entry: entry["path"])
+        summary = self.summary()
+        del summary["entries"]
+        return {"root": self.root, **summary, "entries": entries}
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "entries": self.entries,
+            "directories": self.directories,
+            "errors": self.errors,
+            "truncated": self.truncated
+        }